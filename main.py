@@ -1,21 +1,34 @@
-import argparse, shutil
+import argparse, shutil, contextlib, sys
+from pathlib import Path
+import yaml
 
-from src.runResults import *
-from src.runFigures import *
-from src.utils import get_csv_line_count
+# Chaque sous-commande importe ce dont elle a besoin: add_runs/add_horizon n'importent ni pandas ni
+# matplotlib, run_results n'importe pas matplotlib (temps de démarrage suivi par `benchmark`, startup/*).
+root = Path(__file__).resolve().parent
 
-def generate_figures(suffix):
+def generate_figures(suffix, workers=None, force=False):
+    from src.runStats import load_figure_stats
+    from src.runFigures import figure_job, render_figures
     with open("graph_config.yaml", "r") as f:
         fig_config = yaml.safe_load(f)
     fig_defaults = fig_config['defaults']
     fig_games = fig_config['games']
     fig_root = Path(__file__).resolve().parent
 
+    graph_folder = f"{fig_root}/{fig_defaults['graph_folder']}"
+    # agrégats de l'expérience, ou un seul passage (en cache) sur les sorties, pour toutes les figures
+    stats = load_figure_stats(graph_folder, fig_defaults['n_actions'])
+
+    jobs = []
     for key, val in fig_games.items():
         if len(val['algos']) > 1 and len(val['noise']) > 1 :
             raise "Too many pairs to compare. Either compare different algo combos on one noise level or different noise levels on one algo combo."
         cumul_y = val['cumul_y']
-        generate_fig(cumul_y, val['algos'], val['noise'], val['name'], fig_defaults['n_actions'], f"{fig_root}/{fig_defaults['graph_folder']}", suffix)
+        # sous-échantillonnage des courbes longues: defaults, ou par figure
+        jobs.append(figure_job(cumul_y, val['algos'], val['noise'], val['name'], graph_folder, suffix, stats,
+                               val.get('window'), val.get('top_k'), val.get('downsample', fig_defaults.get('downsample')),
+                               val.get('max_points', fig_defaults.get('max_points', 2000))))
+    render_figures(jobs, graph_folder, workers, force)
 
 def prune_pkls(pkl_folder):
     choice = input("⚠️ You're going to delete pkl files.\n"
@@ -52,19 +65,39 @@ def add(param, n):
     return config
 
 def add_horizon(n):
+    from src.sweep import expand_games
+    from src.adaptive import AdaptiveStopping
+    from src.utils import get_output_row_count, OUTPUT_FORMATS
     with open('config.yaml', "r") as f:
         config = yaml.safe_load(f)
-    n_games = len(config['games'])
     folder = config['defaults']['save_folder']
     runs = config['defaults']['runs']
     horizon = config['defaults']['horizon']
-    csv_files = list(Path(f'{folder}/output').glob("run*.csv"))
-    lines = get_csv_line_count(f'{folder}/output/run{runs-1}.csv')
-    if Path(folder) / "output" / f"run{runs-1}.csv" not in csv_files or lines != horizon * n_games:
+    # mode adaptatif: les jeux arrêtés ne sont pas dans les derniers runs, qui peuvent ne pas exister
+    last_run, n_games = AdaptiveStopping.last_run(folder, runs, len(expand_games(config)))
+    ext = OUTPUT_FORMATS[config['defaults'].get('output_format', 'csv')]
+    last_output = Path(folder) / "output" / f"run{last_run}{ext}"
+    if not last_output.exists() or get_output_row_count(last_output) != horizon * n_games:
         print("‼️Experiment not complete. Can extend horizon only to a complete experiment.")
         return
     add('horizon', n)
 
+def add_profile_arguments(parser):
+    parser.add_argument("--profile", action="store_true", help="Record wall time, calls and memory peak per phase in {folder}/profile.jsonl")
+    parser.add_argument("--no_profile_memory", action="store_true", help="With --profile, skip tracemalloc (much lower overhead)")
+    parser.add_argument("--cprofile", action="store_true", help="With --profile, also dump cProfile stats to {folder}/profile_*.prof")
+
+def get_config_folder(config_file, key):
+    with open(config_file, "r") as f:
+        return yaml.safe_load(f)['defaults'][key]
+
+def profiled(args, command, folder):
+    # sans --profile, aucune fonction n'est instrumentée
+    if not args.profile:
+        return contextlib.nullcontext()
+    from src.profiler import Profiler
+    return Profiler(str(folder), command, memory=not args.no_profile_memory, cprofile=args.cprofile)
+
 def main():
     parser = argparse.ArgumentParser(
         description="RL Framework CLI"
@@ -75,12 +108,18 @@ def main():
         "run_results", help="Run experiments based on a YAML config"
     )
     parser_run.add_argument("--suffix_extend_games", required=False, default='', help="Add suffix when running extended games")
+    parser_run.add_argument("--batch_size", required=False, type=int, default=0, help="Simulate this many runs of a game in lockstep (0 = one run at a time)")
+    parser_run.add_argument("--workers", required=False, type=int, default=None, help="Spread (run, game) work units over N processes, each with its own seeded random stream")
+    add_profile_arguments(parser_run)
 
     # Command 2: generate_figures
     parser_graph = subparsers.add_parser(
         "generate_figures", help="Generate plots from a YAML figure config"
     )
     parser_graph.add_argument("--suffix", required=False, default=None, help="Add suffix to figure name")
+    parser_graph.add_argument("--workers", required=False, type=int, default=None, help="Render figures in N processes")
+    parser_graph.add_argument("--force", action="store_true", help="Render every figure, even those whose data did not change")
+    add_profile_arguments(parser_graph)
 
     # Command 3: prune_pkls
     parser_prune = subparsers.add_parser(
@@ -100,17 +139,50 @@ def main():
     )
     parser_add_horizon.add_argument("--n_horizon", required=True, help="Number of runs to add")
 
+    # Command 6: export_csv
+    parser_export = subparsers.add_parser(
+        "export_csv", help="Export parquet/arrow run outputs to CSV"
+    )
+    parser_export.add_argument("--folder", required=False, default=None, help="Experiment folder (defaults to save_folder in config.yaml)")
+
+    # Command 7: benchmark
+    parser_bench = subparsers.add_parser(
+        "benchmark", help="Measure engine throughput and checkpoint/output/stats timings on synthetic games"
+    )
+    parser_bench.add_argument("--output", required=False, default="benchmarks/latest.json", help="JSON file for the results")
+    parser_bench.add_argument("--baseline", required=False, default=None, help="JSON results to compare against")
+    parser_bench.add_argument("--threshold", required=False, type=float, default=0.1, help="Relative slowdown flagged as a regression (0.1 = 10%%)")
+    parser_bench.add_argument("--quick", action="store_true", help="Small grid, one repetition")
+    parser_bench.add_argument("--update_baseline", action="store_true", help="Write these results to --baseline instead of comparing (requires --baseline)")
+
     args = parser.parse_args()
     if args.command == "run_results":
-        run_results(args.suffix_extend_games)
+        from src.runResults import run_results
+        with profiled(args, "run_results", root / get_config_folder('config.yaml', 'save_folder')):
+            run_results(args.suffix_extend_games, args.batch_size, args.workers)
     elif args.command == "generate_figures":
-        generate_figures(args.suffix)
+        with profiled(args, "generate_figures", root / get_config_folder('graph_config.yaml', 'graph_folder')):
+            generate_figures(args.suffix, args.workers, args.force)
     elif args.command == "prune_pkls":
         prune_pkls(args.path)
     elif args.command == "add_runs":
         add('runs', args.n_runs)
     elif args.command == "add_horizon":
         add_horizon(args.n_horizon)
+    elif args.command == "export_csv":
+        from src.utils import export_csv
+        folder = args.folder
+        if folder is None:
+            with open('config.yaml', "r") as f:
+                folder = yaml.safe_load(f)['defaults']['save_folder']
+        export_csv(f"{folder}/output", f"{folder}/output_csv")
+    elif args.command == "benchmark":
+        if args.update_baseline and not args.baseline:
+            parser_bench.error("--update_baseline requires --baseline")
+        if args.baseline and not args.update_baseline and not Path(args.baseline).exists():
+            parser_bench.error(f"baseline not found: {args.baseline} (use --update_baseline to create it)")
+        from src.benchmark import benchmark
+        benchmark(args.output, args.baseline, args.threshold, args.quick, args.update_baseline)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,90 @@
+import math
+from statistics import NormalDist
+import numpy as np
+import yaml
+from pathlib import Path
+
+class AdaptiveStopping:
+    # Arrêt séquentiel (defaults.adaptive): les runs sont simulés par vagues de `batch_runs`. Après chaque vague,
+    # un jeu s'arrête dès que la demi-largeur de l'intervalle de confiance du regret cumulé final,
+    # z·s/√n d'après les agrégats du StatsStore, passe sous `tolerance` (relative à la moyenne si `relative`).
+    # Un jeu arrêté après n runs n'apparaît que dans les runs 0..n-1; `runs` devient un maximum.
+    # Les arrêts sont définitifs et enregistrés avec la précision atteinte dans {save_folder}/config.yaml.
+    def __init__(self, titles, horizon, tolerance, confidence=0.95, min_runs=10, batch_runs=10, relative=False,
+                 results=None):
+        self.titles = titles
+        self.horizon = horizon
+        self.tolerance = tolerance
+        self.confidence = confidence
+        self.min_runs = max(min_runs, 2)
+        self.batch_runs = batch_runs
+        self.relative = relative
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+        self.games = dict((results or {}).get('games', {}))
+
+    @staticmethod
+    def from_config(settings, titles, horizon, results=None):
+        if not settings:
+            return None
+        return AdaptiveStopping(titles, horizon, results=results, **settings)
+
+    @staticmethod
+    def last_run(folder, runs, n_games):
+        # dernier run écrit et son nombre de jeux d'après le manifeste de l'expérience: si tous les jeux se sont
+        # arrêtés avant `runs`, les derniers runs n'existent pas
+        manifest = Path(f"{folder}/config.yaml")
+        results = {}
+        if manifest.exists():
+            with open(manifest, "r") as f:
+                results = (yaml.safe_load(f) or {}).get('adaptive_results') or {}
+        stops = [game['runs'] for game in results.get('games', {}).values() if game['stopped']]
+        active = n_games - len(stops)
+        last = runs - 1 if active or not stops else min(runs, max(stops)) - 1
+        return last, active + sum(1 for n in stops if n > last)
+
+    def stop_runs(self, title):
+        game = self.games.get(title)
+        return game['runs'] if game is not None and game['stopped'] else math.inf
+
+    def games_for_run(self, r):
+        return [g for g, title in enumerate(self.titles) if r < self.stop_runs(title)]
+
+    def waves(self, runs):
+        for start in range(0, runs, self.batch_runs):
+            yield list(range(start, min(start + self.batch_runs, runs)))
+
+    def precision(self, acc):
+        # regret cumulé au dernier pas, pire agent
+        t = self.horizon - 1
+        n = int(acc.count[t])
+        mean = acc.mean_cum_regret[:, t]
+        std = np.sqrt(acc.m2_cum_regret[:, t] / (n - 1)) if n > 1 else np.full(acc.n_agents, np.inf)
+        half_width = self.z * std / math.sqrt(max(n, 1))
+        if self.relative:
+            half_width = half_width / np.maximum(np.abs(mean), 1e-12)
+        worst = int(np.argmax(half_width))
+        return {'runs': n, 'mean_final_regret': float(mean[worst]), 'std_final_regret': float(std[worst]),
+                'half_width': float(half_width[worst])}
+
+    def update(self, store, can_stop=True):
+        # précision de chaque jeu d'après les runs terminés; renvoie les jeux arrêtés à cette vague
+        stopped = []
+        for title in self.titles:
+            acc = store.titles.get(title)
+            if acc is None or acc.horizon < self.horizon:
+                continue
+            game = self.precision(acc)
+            previous = self.games.get(title)
+            if previous is not None and previous['stopped']:
+                game.update(runs=previous['runs'], stopped=True)
+            else:
+                game['stopped'] = (can_stop and game['runs'] >= self.min_runs
+                                   and game['half_width'] <= self.tolerance)
+                if game['stopped']:
+                    stopped.append((title, game['runs']))
+            self.games[title] = game
+        return stopped
+
+    def to_manifest(self):
+        return {'tolerance': self.tolerance, 'confidence': self.confidence, 'relative': self.relative,
+                'games': self.games}
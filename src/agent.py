@@ -8,20 +8,28 @@ class Agent:
 
         self.learning_algo = algo
         self.a_space = a_space
-        self.regret = []
-        self.reward = []
-
-    def update(self, action, step_reward, step_regret):
+        # rempli par l'environnement dans ajouter_agents
+        self.trajectory = None
+        self.agent_id = None
+
+    @property
+    def regret(self):
+        if self.trajectory is None:
+            return np.zeros(0)
+        return self.trajectory.regrets[self.agent_id, :self.trajectory.length]
+
+    @property
+    def reward(self):
+        if self.trajectory is None:
+            return np.zeros(0)
+        return self.trajectory.rewards[self.agent_id, :self.trajectory.length]
+
+    def update(self, action, step_reward):
+        # seul le bras joué change: sa moyenne et les statistiques de la politique sont mises à jour sur place
         self.a_space.plays[action] += 1
         self.a_space.sums[action] += step_reward
-        self.a_space.avg_reward = np.divide(
-            self.a_space.sums,
-            self.a_space.plays,
-            out=np.zeros_like(self.a_space.sums, dtype=float),
-            where=self.a_space.plays != 0
-        )
-        self.regret.append(step_regret)
-        self.reward.append(step_reward)
+        self.a_space.avg_reward[action] = self.a_space.sums[action] / self.a_space.plays[action]
+        self.learning_algo.update(action)
 
     def train(self):
         self.a_space.t += 1
@@ -29,19 +37,20 @@ class Agent:
 
         return action, exploration
 
-    def serialize(self):
-        return {
-            'regret': self.regret,
-            'reward': self.reward,
+    def serialize(self, with_trajectory=True):
+        data = {
             'a_space': self.a_space.serialize(),
             'learning_algo': self.learning_algo.serialize(),
         }
+        if with_trajectory:
+            data['regret'] = self.regret
+            data['reward'] = self.reward
+        return data
 
     @staticmethod
     def from_serialized(data):
+        # regret/reward sont rattachés à la trajectoire par Environnement.from_serialized
         learning_algo = LearningAlgo.from_serialized(data['learning_algo'])
         a_space = AgentSpace.from_serialized(data['a_space'])
-        agent = Agent(a_space, learning_algo)
-        agent.regret = data['regret']
-        agent.reward = data['reward']
-        return agent
\ No newline at end of file
+        learning_algo.a_space = a_space
+        return Agent(a_space, learning_algo)
@@ -27,4 +27,48 @@ class AgentSpace:
         obj.avg_reward = np.array(data['avg_reward'])
         obj.sums = np.array(data['sums'])
         obj.t = data['t']
-        return obj
\ No newline at end of file
+        return obj
+
+class BatchAgentSpace:
+    def __init__(self, n_runs, n_agents, n_arms):
+        self.target_plays = np.zeros((n_runs, n_agents, n_arms), dtype=int)
+        self.plays = np.zeros((n_runs, n_agents, n_arms), dtype=int)
+        self.avg_reward = np.zeros((n_runs, n_agents, n_arms))
+        self.sums = np.zeros((n_runs, n_agents, n_arms))
+        self.t = 0
+        self.n_runs = n_runs
+        self.n_agents = n_agents
+        self.n_arms = n_arms
+
+    def update(self, actions, step_rewards):
+        # actions, step_rewards: (n_runs, n_agents)
+        runs = np.arange(self.n_runs)[:, None]
+        agents = np.arange(self.n_agents)[None, :]
+        self.plays[runs, agents, actions] += 1
+        self.sums[runs, agents, actions] += step_rewards
+        self.avg_reward[runs, agents, actions] = (
+            self.sums[runs, agents, actions] / self.plays[runs, agents, actions]
+        )
+
+    def to_agent_space(self, run, agent):
+        a_space = AgentSpace(self.n_arms)
+        a_space.target_plays = self.target_plays[run, agent].copy()
+        a_space.plays = self.plays[run, agent].copy()
+        a_space.avg_reward = self.avg_reward[run, agent].copy()
+        a_space.sums = self.sums[run, agent].copy()
+        a_space.t = self.t
+        return a_space
+
+    @staticmethod
+    def from_agent_spaces(spaces):
+        # spaces: liste [run][agent] d'AgentSpace partageant le même t
+        n_runs, n_agents = len(spaces), len(spaces[0])
+        obj = BatchAgentSpace(n_runs, n_agents, spaces[0][0].n_arms)
+        for r, run_spaces in enumerate(spaces):
+            for i, a_space in enumerate(run_spaces):
+                obj.target_plays[r, i] = a_space.target_plays
+                obj.plays[r, i] = a_space.plays
+                obj.avg_reward[r, i] = a_space.avg_reward
+                obj.sums[r, i] = a_space.sums
+        obj.t = spaces[0][0].t
+        return obj
@@ -0,0 +1,202 @@
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import io
+import contextlib
+import subprocess
+from datetime import datetime, timezone
+import numpy as np
+
+from src.execute import Execute
+from src.policies import POLICIES
+from src.utils import (save_pickle, load_checkpoint, aggregate_metrics_from_single_pkl,
+                       normalizeMatrix, require_pyarrow)
+from src.runResults import merge_game_metrics
+from src.runStats import runStats, collect_stats
+
+# Mesures de débit du moteur et de la chaîne checkpoint -> sorties -> statistiques, sur des jeux synthétiques.
+# Chaque résultat: {'value', 'unit', 'higher_is_better'}; comparaison à une référence avec un seuil relatif.
+FULL_GRID = {'agents': (2, 3), 'arms': (3, 10), 'horizons': (1000, 10000)}
+QUICK_GRID = {'agents': (2,), 'arms': (3,), 'horizons': (1000,)}
+# modules importés à la demande par chaque sous-commande de main.py (à tenir à jour avec main.py)
+STARTUP_COMMANDS = {
+    'cli': [],
+    'add_runs': [],
+    'add_horizon': ['src.sweep', 'src.adaptive', 'src.utils'],
+    'run_results': ['src.runResults'],
+    'generate_figures': ['src.runStats', 'src.runFigures'],
+}
+HEAVY_MODULES = ('pandas', 'matplotlib', 'seaborn')
+
+def synthetic_game(n_agents, n_arms, seed=0):
+    rng = np.random.default_rng(seed)
+    return [normalizeMatrix(rng.random((n_arms,) * n_agents), 0) for _ in range(n_agents)]
+
+def best_time(fn, repeat):
+    # meilleur temps sur repeat essais (le moins perturbé par la charge de la machine)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+def quiet(fn):
+    # les fonctions de sauvegarde affichent une ligne par fichier écrit
+    def wrapped():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return fn()
+    return wrapped
+
+def simulate(algo, n_agents, n_arms, horizon, seed=0):
+    matrices = synthetic_game(n_agents, n_arms)
+    rng = np.random.default_rng(seed)
+    return Execute(1, horizon, n_agents, [None] * n_agents, "BENCH", n_arms).run_one_game(
+        0, None, matrices, [algo] * n_agents, 'normal', [0.0, 0.1], rng)
+
+def bench_engine(results, grid, repeat):
+    for algo in POLICIES:
+        for n_agents in grid['agents']:
+            for n_arms in grid['arms']:
+                for horizon in grid['horizons']:
+                    elapsed = best_time(lambda: simulate(algo, n_agents, n_arms, horizon), repeat)
+                    results[f"engine/{algo}/agents={n_agents}/arms={n_arms}/T={horizon}"] = {
+                        'value': horizon / elapsed, 'unit': 'steps/s', 'higher_is_better': True}
+
+def bench_startup(results, repeat):
+    # démarrage d'un nouvel interpréteur qui importe main puis les modules de la sous-commande
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for command, modules in STARTUP_COMMANDS.items():
+        code = "; ".join(["import sys, main"] + [f"import {module}" for module in modules]
+                         + [f"print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"])
+        run = lambda: subprocess.run([sys.executable, "-c", code], cwd=root, check=True, capture_output=True, text=True)
+        loaded = run().stdout.strip()
+        results[f"startup/{command}"] = {'value': best_time(run, max(repeat, 3)), 'unit': 's',
+                                         'higher_is_better': False, 'modules': loaded.split(',') if loaded else []}
+
+def write_synthetic_runs(folder, n_runs, n_agents, n_arms, horizon):
+    # checkpoints de n_runs runs (un jeu par algorithme), comme les écrit run_results
+    for r in range(n_runs):
+        metrics, envs = [], []
+        for g, algo in enumerate(POLICIES):
+            regrets, rewards, plays, explorations, title, env = simulate(algo, n_agents, n_arms, horizon, seed=r)
+            merge_game_metrics(metrics, g, r, n_agents, len(POLICIES), title, n_arms, 0,
+                               regrets, rewards, plays, explorations)
+            envs.append(env)
+        quiet(lambda: save_pickle(folder, r, metrics, envs, ''))()
+    return [os.path.join(folder, "pkl", f"cp_run{r}.pkl") for r in range(n_runs)]
+
+def bench_pipeline(results, folder, n_runs, n_agents, n_arms, horizon, repeat):
+    pkl_files = write_synthetic_runs(folder, n_runs, n_agents, n_arms, horizon)
+    cp = load_checkpoint(pkl_files[0])
+    env_list = [simulate(algo, n_agents, n_arms, horizon)[5] for algo in POLICIES]
+    size = f"runs={n_runs}/agents={n_agents}/T={horizon}"
+
+    results[f"checkpoint/save/{size}"] = {
+        'value': best_time(quiet(lambda: save_pickle(folder, n_runs, cp['metrics'], env_list, '_bench')), repeat),
+        'unit': 's', 'higher_is_better': False}
+    results[f"checkpoint/load/{size}"] = {
+        'value': best_time(lambda: load_checkpoint(pkl_files[0]), repeat), 'unit': 's', 'higher_is_better': False}
+    os.remove(os.path.join(folder, "pkl", f"cp_run{n_runs}_bench.pkl"))
+    os.remove(os.path.join(folder, "pkl", f"cp_run{n_runs}_bench.json"))
+
+    formats = ['csv']
+    try:
+        require_pyarrow('parquet')
+        formats += ['parquet', 'arrow']
+    except RuntimeError:
+        pass
+    title = cp['metrics'][0]['title']
+    for output_format in formats:
+        results[f"aggregate/{output_format}/{size}"] = {
+            'value': best_time(quiet(lambda: aggregate_metrics_from_single_pkl(pkl_files[0], output_format)), repeat),
+            'unit': 's', 'higher_is_better': False}
+        for pkl_file in pkl_files:
+            quiet(lambda: aggregate_metrics_from_single_pkl(pkl_file, output_format))()
+        output_folder = os.path.join(folder, "output") + "/"
+        results[f"runStats/{output_format}/{size}"] = {
+            'value': best_time(lambda: runStats(output_folder, title, n_arms), repeat),
+            'unit': 's', 'higher_is_better': False}
+
+        def cold_collect():
+            cache_path = os.path.join(folder, "stats_cache.pkl")
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+            collect_stats(output_folder, n_arms)
+        results[f"collect_stats/{output_format}/{size}"] = {
+            'value': best_time(cold_collect, repeat), 'unit': 's', 'higher_is_better': False}
+
+def run_benchmarks(quick=False, repeat=None):
+    repeat = repeat or (1 if quick else 3)
+    grid = QUICK_GRID if quick else FULL_GRID
+    results = {}
+    bench_startup(results, repeat)
+    bench_engine(results, grid, repeat)
+    folder = tempfile.mkdtemp(prefix="rlfw_bench_")
+    try:
+        if quick:
+            bench_pipeline(results, folder, 4, 2, 3, 1000, repeat)
+        else:
+            bench_pipeline(results, folder, 10, 2, 3, 5000, repeat)
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'quick': quick,
+            'repeat': repeat,
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+
+def compare(report, baseline, threshold):
+    # variation relative par mesure commune; régression si pire que le seuil dans le sens défavorable
+    rows = []
+    for name, res in report['results'].items():
+        base = baseline['results'].get(name)
+        if base is None or base['value'] == 0:
+            continue
+        change = (res['value'] - base['value']) / base['value']
+        worse = -change if res['higher_is_better'] else change
+        rows.append({'name': name, 'baseline': base['value'], 'value': res['value'], 'unit': res['unit'],
+                     'change': change, 'regression': worse > threshold})
+    return rows
+
+def benchmark(output, baseline=None, threshold=0.1, quick=False, update_baseline=False):
+    # une référence absente ne doit pas passer pour une absence de régression
+    if baseline and not update_baseline and not os.path.exists(baseline):
+        raise FileNotFoundError(f"Baseline not found: {baseline} (use --update_baseline to create it)")
+    report = run_benchmarks(quick)
+    for name, res in report['results'].items():
+        modules = f"  (imports {', '.join(res['modules'])})" if res.get('modules') else ""
+        print(f"{name:<50} {res['value']:>14.4f} {res['unit']}{modules}")
+
+    if baseline and not update_baseline:
+        with open(baseline) as f:
+            rows = compare(report, json.load(f), threshold)
+        report['comparison'] = {'baseline': baseline, 'threshold': threshold, 'rows': rows}
+        regressions = [row for row in rows if row['regression']]
+        for row in regressions:
+            print(f"‼️ Regression: {row['name']} {row['baseline']:.4f} -> {row['value']:.4f} {row['unit']} "
+                  f"({row['change']:+.1%})")
+        if not regressions:
+            print(f"✅ No regression above {threshold:.0%} against {baseline}")
+    else:
+        regressions = []
+
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"📝 Saved benchmark results: {output}")
+    if update_baseline and baseline:
+        shutil.copyfile(output, baseline)
+        print(f"📝 Updated baseline: {baseline}")
+    if regressions:
+        sys.exit(1)
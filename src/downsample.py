@@ -0,0 +1,58 @@
+import numpy as np
+
+# Réduction du nombre de points d'une courbe avant le tracé (graph_config: downsample, max_points), en gardant
+# sa forme: indices des points conservés, premier et dernier inclus, dans l'ordre.
+
+METHODS = ('lttb', 'minmax')
+
+def bucket_edges(n, n_buckets):
+    # découpage de [1, n-1) en n_buckets intervalles (le premier et le dernier point sont gardés à part)
+    return np.linspace(1, n - 1, n_buckets + 1).astype(np.int64)
+
+def lttb(y, n_out):
+    # Largest-Triangle-Three-Buckets: dans chaque intervalle, le point formant le plus grand triangle avec le
+    # point retenu précédemment et la moyenne de l'intervalle suivant
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = bucket_edges(n, n_out - 2)
+    indices = np.empty(n_out, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for b in range(n_out - 2):
+        start, stop = edges[b], edges[b + 1]
+        if b + 2 < len(edges):
+            next_x = (edges[b + 1] + edges[b + 2] - 1) / 2
+            next_y = y[edges[b + 1]:edges[b + 2]].mean()
+        else:
+            next_x, next_y = n - 1, y[-1]
+        x = np.arange(start, stop)
+        area = np.abs((a - next_x) * (y[start:stop] - y[a]) - (a - x) * (next_y - y[a]))
+        a = start + int(np.argmax(area))
+        indices[b + 1] = a
+    return indices
+
+def minmax(y, n_out):
+    # minimum et maximum de chaque intervalle: les pics et creux restent visibles
+    y = np.asarray(y, dtype=float)
+    n = len(y)
+    if n_out >= n or n_out < 4:
+        return np.arange(n)
+    edges = bucket_edges(n, (n_out - 2) // 2)
+    picked = [0, n - 1]
+    for start, stop in zip(edges[:-1], edges[1:]):
+        if stop > start:
+            chunk = y[start:stop]
+            picked += [start + int(np.argmin(chunk)), start + int(np.argmax(chunk))]
+    return np.unique(picked)
+
+def downsample(y, method=None, max_points=None):
+    # (x, y) prêts à tracer; sans méthode ou sous max_points, la courbe est inchangée
+    y = np.asarray(y)
+    if method is None or max_points is None or len(y) <= max_points:
+        return np.arange(len(y)), y
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsample method: {method}. Use one of {', '.join(METHODS)}.")
+    indices = lttb(y, max_points) if method == 'lttb' else minmax(y, max_points)
+    return indices, y[indices]
@@ -1,37 +1,44 @@
 import numpy as np
 
 from src.agent import Agent
+from src.trajectory import Trajectory
+from src.gameModel import GameModel
+from src.rngBuffer import RngBuffer
 
 class Environnement:
-    def __init__(self, matrices, noise_dist, noise_params):
+    def __init__(self, matrices, noise_dist, noise_params, rng=None, model=None):
         self.agents = []
         self.matrices = matrices
+        self.model = model if model is not None else GameModel.shared(matrices)
         self.noise_dist = noise_dist
         self.noise_params = noise_params
+        # sans générateur dédié, on tire dans l'état global de np.random
+        self.rng = rng if rng is not None else np.random
+        self.trajectory = Trajectory()
 
     def ajouter_agents(self, agent):
+        agent.trajectory = self.trajectory
+        agent.agent_id = self.trajectory.add_agent()
         self.agents.append(agent)
 
     def sample_noise(self):
         if self.noise_dist == 'normal':
             mean, var = self.noise_params
             std = np.sqrt(var)
-            return np.random.normal(mean, std)
+            return self.rng.normal(mean, std)
         else:
             raise ValueError(f"Unknown noise distribution: {self.noise_dist}")
 
-    def updateStep(self, actions):
+    def updateStep(self, actions, explorations):
+        flat = self.model.flat_index(actions)
         rewards = []
         for i in range(len(self.agents)):
-            rewards.append(self.matrices[i][*actions] + self.sample_noise())
-
-        min_matrix = np.minimum(self.matrices[0], self.matrices[1])
-        max_val = np.max(min_matrix)
-        regret_matrix = max_val - min_matrix
-        regret = regret_matrix[*actions]
+            rewards.append(self.model.payoff_rows[i][flat] + self.sample_noise())
+        regret = self.model.regret_list[flat]
 
         for i in range(len(self.agents)):
-            self.agents[i].update(actions[i], rewards[i], regret)
+            self.agents[i].update(actions[i], rewards[i])
+        self.trajectory.record(actions, explorations, rewards, regret)
 
     def step(self):
         acts, explorations = [], []
@@ -39,26 +46,57 @@ class Environnement:
             action, exp = self.agents[i].train()
             acts.append(action)
             explorations.append(exp)
-        self.updateStep(acts)
+        self.updateStep(acts, explorations)
         return acts, explorations
 
-    def serialize(self):
-        return {
+    def serialize(self, with_trajectory=True):
+        data = {
             'matrices': self.matrices,
             'noise_dist': self.noise_dist,
             'noise_params': self.noise_params,
-            'agents': [agent.serialize() for agent in self.agents]
+            'agents': [agent.serialize(with_trajectory) for agent in self.agents],
         }
+        if with_trajectory:
+            data['plays'] = self.trajectory.plays[:, :self.trajectory.length]
+            data['explorations'] = self.trajectory.explorations[:, :self.trajectory.length]
+        if isinstance(self.rng, RngBuffer):
+            data['rng_buffer'] = self.rng.serialize()
+        elif isinstance(self.rng, np.random.Generator):
+            data['rng_state'] = self.rng.bit_generator.state
+        return data
 
     @staticmethod
     def from_serialized(data):
+        rng = None
+        if 'rng_buffer' in data:
+            rng = RngBuffer.from_serialized(data['rng_buffer'])
+        elif 'rng_state' in data:
+            rng = np.random.default_rng()
+            rng.bit_generator.state = data['rng_state']
         env = Environnement(
             data['matrices'],
             data['noise_dist'],
-            data['noise_params']
+            data['noise_params'],
+            rng
         )
-        env.agents = [
-            Agent.from_serialized(agent_data)
-            for i, agent_data in enumerate(data['agents'])
-        ]
-        return env
\ No newline at end of file
+        for agent_data in data['agents']:
+            agent = Agent.from_serialized(agent_data)
+            agent.learning_algo.rng = env.rng
+            env.ajouter_agents(agent)
+
+        if 'reward' not in data['agents'][0]:
+            # état sans trajectoire (segment de checkpoint intermédiaire)
+            return env
+
+        rewards = np.array([agent_data['reward'] for agent_data in data['agents']], dtype=np.float64)
+        regrets = np.array([agent_data['regret'] for agent_data in data['agents']], dtype=np.float64)
+        # les anciens checkpoints ne gardent pas les actions dans l'environnement
+        plays = data.get('plays', np.zeros(rewards.shape, dtype=np.int64))
+        explorations = data.get('explorations', np.zeros(rewards.shape, dtype=np.int8))
+        env.set_trajectory(Trajectory.from_arrays(plays, explorations, rewards, regrets))
+        return env
+
+    def set_trajectory(self, trajectory):
+        self.trajectory = trajectory
+        for agent in self.agents:
+            agent.trajectory = trajectory
\ No newline at end of file
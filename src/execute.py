@@ -1,9 +1,11 @@
 import numpy as np
 
-from src.agentSpace import AgentSpace
-from src.learningAlgo import LearningAlgo
+from src.agentSpace import AgentSpace, BatchAgentSpace
+from src.learningAlgo import LearningAlgo, BatchLearningAlgo
 from src.agent import Agent
 from src.environment import Environnement
+from src.trajectory import Trajectory
+from src.gameModel import GameModel
 
 class Execute:
     def __init__(self, n_instance, T, n_agents, const, title, n_actions):
@@ -14,22 +16,96 @@ class Execute:
         self.title = title
         self.n_actions = n_actions
 
-    def run_one_game(self, start_iter, env, matrices, algo, noise_dist, noise_params):
+    @staticmethod
+    def game_title(algo, noise_params, name):
+        return f"{'×'.join(algo)}_{'_'.join(str(n) for n in noise_params)}_{name}"
+
+    def run_one_game(self, start_iter, env, matrices, algo, noise_dist, noise_params, rng=None, checkpointer=None):
         if env is None:
-            env = Environnement(matrices, noise_dist, noise_params)
+            env = Environnement(matrices, noise_dist, noise_params, rng)
             for agent in range(0, self.n_agents):
                 a_space = AgentSpace(self.n_actions)
-                learning_algo = LearningAlgo(self.const[agent], algo[agent], a_space, noise_params[1])
+                learning_algo = LearningAlgo(self.const[agent], algo[agent], a_space, noise_params[1], env.rng)
                 env.ajouter_agents(Agent(a_space, learning_algo))
 
-        title = f"{'×'.join(algo)}_{'_'.join(str(n) for n in noise_params)}_{self.title}"
-
-        plays = np.zeros((self.n_agents, self.T))
-        exploration_list = plays.copy()
-        for i in range(start_iter, self.T):
-            actions, explorations = env.step()
-            plays[:, i] = actions
-            exploration_list[:, i] = explorations
-            regrets = np.array([agent.regret[start_iter:] for agent in env.agents])
-            rewards = np.array([agent.reward[start_iter:] for agent in env.agents])
-        return regrets, rewards, plays[:, start_iter:], exploration_list[:, start_iter:], title, env
\ No newline at end of file
+        title = self.game_title(algo, noise_params, self.title)
+
+        env.trajectory.reserve(self.T)
+        if checkpointer is None:
+            for i in range(start_iter, self.T):
+                env.step()
+        else:
+            checkpointer.start(start_iter)
+            for i in range(start_iter, self.T):
+                env.step()
+                if checkpointer.due(i + 1):
+                    checkpointer.save(env)
+            checkpointer.save(env)
+        regrets, rewards, plays, exploration_list = env.trajectory.view(start_iter, self.T)
+        return regrets, rewards, plays, exploration_list, title, env
+
+class BatchExecute(Execute):
+    def __init__(self, n_instance, T, n_agents, const, title, n_actions, rng):
+        super().__init__(n_instance, T, n_agents, const, title, n_actions)
+        self.rng = rng
+
+    def run_games(self, start_iter, envs, matrices, algo, noise_dist, noise_params):
+        # Fait avancer tous les runs d'un même jeu en parallèle: l'état des agents est tenu
+        # dans des tableaux (runs, agents, bras) et chaque pas est calculé pour tous les runs à la fois.
+        if noise_dist != 'normal':
+            raise ValueError(f"Unknown noise distribution: {noise_dist}")
+        n_runs = self.n_instance
+
+        if envs is None:
+            a_space = BatchAgentSpace(n_runs, self.n_agents, self.n_actions)
+        else:
+            a_space = BatchAgentSpace.from_agent_spaces([[agent.a_space for agent in env.agents] for env in envs])
+        learning_algos = []
+        for agent in range(self.n_agents):
+            learning_algo = BatchLearningAlgo(self.const[agent], algo[agent], a_space, agent, noise_params[1], self.rng)
+            if envs is not None:
+                learning_algo.init_sequence = np.array([env.agents[agent].learning_algo.init_sequence for env in envs])
+            learning_algos.append(learning_algo)
+
+        model = GameModel.shared(matrices)
+        mean, var = noise_params
+        std = np.sqrt(var)
+
+        n_steps = self.T - start_iter
+        plays = np.zeros((n_runs, self.n_agents, n_steps), dtype=np.int64)
+        explorations = np.zeros((n_runs, self.n_agents, n_steps), dtype=np.int8)
+        rewards = np.zeros((n_runs, self.n_agents, n_steps), dtype=np.float64)
+        regrets = np.zeros((n_runs, self.n_agents, n_steps), dtype=np.float64)
+        agent_idx = np.arange(self.n_agents)[None, :]
+
+        for i in range(n_steps):
+            a_space.t += 1
+            for agent, learning_algo in enumerate(learning_algos):
+                plays[:, agent, i], explorations[:, agent, i] = learning_algo.getAction()
+            actions = plays[:, :, i]
+            flat = model.flat_indices(actions)
+            step_rewards = model.payoffs[agent_idx, flat[:, None]] + self.rng.normal(mean, std, (n_runs, self.n_agents))
+            rewards[:, :, i] = step_rewards
+            regrets[:, :, i] = model.regret[flat][:, None]
+            a_space.update(actions, step_rewards)
+
+        title = self.game_title(algo, noise_params, self.title)
+        results = []
+        for r in range(n_runs):
+            env = Environnement(matrices, noise_dist, noise_params, model=model)
+            for agent in range(self.n_agents):
+                agent_space = a_space.to_agent_space(r, agent)
+                learning_algo = LearningAlgo(self.const[agent], algo[agent], agent_space, noise_params[1])
+                learning_algo.init_sequence = learning_algos[agent].init_sequence[r].copy()
+                env.ajouter_agents(Agent(agent_space, learning_algo))
+            if envs is None:
+                env.set_trajectory(Trajectory.from_arrays(plays[r], explorations[r], rewards[r], regrets[r]))
+            else:
+                prev_regrets, prev_rewards, prev_plays, prev_explorations = envs[r].trajectory.view()
+                env.set_trajectory(Trajectory.from_arrays(
+                    np.concatenate([prev_plays, plays[r]], axis=1),
+                    np.concatenate([prev_explorations, explorations[r]], axis=1),
+                    np.concatenate([prev_rewards, rewards[r]], axis=1),
+                    np.concatenate([prev_regrets, regrets[r]], axis=1)))
+            results.append((*env.trajectory.view(start_iter, self.T), title, env))
+        return results
@@ -0,0 +1,46 @@
+import hashlib
+import numpy as np
+
+class GameModel:
+    # Forme compilée d'un jeu, construite une fois et partagée par tous les runs: gains de chaque agent et
+    # regret aplatis, avec les pas (strides) pour passer d'une action jointe à un indice plat.
+    # Le regret est celui de l'action jointe par rapport au meilleur gain garanti à tous les joueurs:
+    # max(min_i M_i) - min_i M_i[a], le minimum portant sur tous les agents.
+    _shared = {}
+
+    def __init__(self, matrices):
+        tensors = [np.asarray(m, dtype=float) for m in matrices]
+        self.shape = tensors[0].shape
+        self.n_agents = len(tensors)
+        self.strides = [int(np.prod(self.shape[i + 1:], dtype=np.int64)) for i in range(len(self.shape))]
+        self.payoffs = np.stack([m.ravel() for m in tensors])  # (n_agents, k ** n)
+        min_payoff = self.payoffs.min(axis=0)
+        self.regret = min_payoff.max() - min_payoff
+        # listes Python pour les accès scalaires du moteur pas à pas
+        self.payoff_rows = [row.tolist() for row in self.payoffs]
+        self.regret_list = self.regret.tolist()
+
+    @staticmethod
+    def key(matrices):
+        digest = hashlib.sha1()
+        for m in matrices:
+            m = np.ascontiguousarray(m, dtype=float)
+            digest.update(str(m.shape).encode())
+            digest.update(m.tobytes())
+        return digest.hexdigest()
+
+    @staticmethod
+    def shared(matrices):
+        # un seul modèle par jeu et par processus, y compris pour les environnements restaurés d'un checkpoint
+        key = GameModel.key(matrices)
+        model = GameModel._shared.get(key)
+        if model is None:
+            model = GameModel._shared[key] = GameModel(matrices)
+        return model
+
+    def flat_index(self, actions):
+        return sum(a * s for a, s in zip(actions, self.strides))
+
+    def flat_indices(self, actions):
+        # actions: (runs, n_agents) -> (runs,)
+        return np.asarray(actions, dtype=np.int64) @ np.array(self.strides, dtype=np.int64)
@@ -0,0 +1,158 @@
+import numpy as np
+
+def joint_action_base(n_agents, n_actions):
+    # poids de chaque agent dans le code d'une action jointe (agent 0 = chiffre de poids fort)
+    return n_actions ** np.arange(n_agents - 1, -1, -1, dtype=np.int64)
+
+def encode_joint_actions(plays, n_actions):
+    # plays: (..., n_agents, T) -> codes (..., T) en base n_actions
+    plays = np.asarray(plays, dtype=np.int64)
+    base = joint_action_base(plays.shape[-2], n_actions)
+    return np.einsum('a,...at->...t', base, plays)
+
+def decode_joint_action(code, n_agents, n_actions):
+    # libellé 1-indexé d'une action jointe, comme itertools.product(range(1, n_actions + 1), repeat=n_agents)
+    digits = []
+    for _ in range(n_agents):
+        code, digit = divmod(int(code), n_actions)
+        digits.append(digit + 1)
+    return tuple(reversed(digits))
+
+class JointActionCounts:
+    # Histogramme creux des actions jointes par pas de temps, au format COO: seules les cases (t, code) non nulles
+    # sont gardées, triées par pas puis par code. counts[i] = nombre de runs ayant joué l'action jointe cells[i]
+    # au pas times[i]. Mémoire O(T × min(runs, codes observés)) au lieu de O(T × n_actions ** n_agents); les
+    # proportions ne sont rendues denses qu'au tracé, pour les seules courbes demandées.
+    # Les ajouts sont mis en attente et fusionnés par lots (compact) quand ils dépassent la taille déjà fusionnée.
+    min_pending = 1 << 20
+
+    def __init__(self, n_agents, n_actions, horizon=0):
+        self.n_agents = n_agents
+        self.n_actions = n_actions
+        self.horizon = horizon
+        self.times = np.zeros(0, dtype=np.int64)
+        self.cells = np.zeros(0, dtype=np.int64)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.pending = []
+        self.pending_size = 0
+
+    @property
+    def codes(self):
+        # codes effectivement observés, triés
+        self.compact()
+        return np.unique(self.cells)
+
+    def grow(self, horizon):
+        self.horizon = max(self.horizon, horizon)
+
+    def queue(self, times, cells, counts):
+        self.pending.append((times, cells, counts))
+        self.pending_size += times.size
+        if self.pending_size >= max(self.times.size, self.min_pending):
+            self.compact()
+
+    def compact(self):
+        # fusion des ajouts en attente: une case par (t, code)
+        if not self.pending:
+            return
+        times = np.concatenate([self.times] + [p[0] for p in self.pending])
+        cells = np.concatenate([self.cells] + [p[1] for p in self.pending])
+        counts = np.concatenate([self.counts] + [p[2] for p in self.pending])
+        self.pending, self.pending_size = [], 0
+        order = np.lexsort((cells, times))
+        times, cells, counts = times[order], cells[order], counts[order]
+        first = np.ones(times.size, dtype=bool)
+        first[1:] = (times[1:] != times[:-1]) | (cells[1:] != cells[:-1])
+        starts = np.flatnonzero(first)
+        self.times, self.cells = times[starts], cells[starts]
+        self.counts = np.add.reduceat(counts, starts) if starts.size else counts
+
+    def add(self, codes, start=0):
+        # codes: (T,) pour un run ou (runs, T); seuls les pas [start, T) sont comptés
+        codes = np.atleast_2d(codes)[:, start:]
+        n_time = codes.shape[1]
+        self.grow(start + n_time)
+        times = np.broadcast_to(np.arange(start, start + n_time, dtype=np.int64), codes.shape).ravel()
+        self.queue(times, np.asarray(codes, dtype=np.int64).ravel(), np.ones(times.size, dtype=np.int64))
+
+    def add_plays(self, plays, start=0):
+        self.add(encode_joint_actions(plays, self.n_actions), start)
+
+    def merge(self, other):
+        other.compact()
+        self.grow(other.horizon)
+        if other.times.size:
+            self.queue(other.times, other.cells, other.counts)
+
+    def truncate(self, horizon):
+        self.compact()
+        out = JointActionCounts(self.n_agents, self.n_actions, min(horizon, self.horizon))
+        keep = self.times < horizon
+        out.times, out.cells, out.counts = self.times[keep], self.cells[keep], self.counts[keep]
+        return out
+
+    def labels(self, codes=None):
+        codes = self.codes if codes is None else codes
+        return [decode_joint_action(code, self.n_agents, self.n_actions) for code in codes]
+
+    def series(self, columns, n_columns):
+        # comptes denses (T, n_columns); columns: colonne de chaque case, -1 pour l'ignorer
+        keep = columns >= 0
+        flat = self.times[keep] * n_columns + columns[keep]
+        counts = np.bincount(flat, weights=self.counts[keep], minlength=self.horizon * n_columns)
+        return counts.reshape(self.horizon, n_columns)
+
+    @staticmethod
+    def windowed(counts, n_runs, window=None):
+        # proportion des runs; avec window, moyenne glissante sur les window derniers pas, calculée par
+        # différence des comptes cumulés
+        if not window or window <= 1:
+            return counts / n_runs
+        cum = np.cumsum(counts, axis=0)
+        lagged = np.zeros_like(cum)
+        lagged[window:] = cum[:-window]
+        span = np.minimum(np.arange(1, counts.shape[0] + 1), window)[:, None]
+        return (cum - lagged) / (span * n_runs)
+
+    def proportions(self, n_runs, window=None, codes=None):
+        # proportion des runs jouant chaque action jointe de codes (triés; par défaut tous les codes observés)
+        self.compact()
+        codes = self.codes if codes is None else np.asarray(codes, dtype=np.int64)
+        columns = np.searchsorted(codes, self.cells)
+        found = columns < codes.size
+        found[found] = codes[columns[found]] == self.cells[found]
+        return self.windowed(self.series(np.where(found, columns, -1), codes.size), n_runs, window)
+
+    def top_k(self, n_runs, k, window=None):
+        # les k actions jointes les plus jouées sur l'horizon; le reste est regroupé dans une colonne "autres"
+        self.compact()
+        codes, columns = np.unique(self.cells, return_inverse=True)
+        totals = np.bincount(columns, weights=self.counts, minlength=codes.size)
+        order = np.argsort(-totals, kind='stable')
+        keep = np.sort(order[:k])
+        props = self.proportions(n_runs, window, codes[keep])
+        other = None
+        if keep.size < codes.size:
+            rest = np.where(np.isin(columns, keep), -1, 0)
+            other = self.windowed(self.series(rest, 1), n_runs, window)[:, 0]
+        return codes[keep], props, other
+
+    def to_dense(self, n_runs):
+        # ancienne forme (T, n_actions ** n_agents); réservée aux petits jeux
+        self.compact()
+        dense = np.zeros((self.horizon, self.n_actions ** self.n_agents))
+        dense[self.times, self.cells] = self.counts / n_runs
+        return dense
+
+    def to_arrays(self, prefix='joint_'):
+        self.compact()
+        return {f'{prefix}horizon': np.array(self.horizon), f'{prefix}times': self.times,
+                f'{prefix}cells': self.cells, f'{prefix}counts': self.counts}
+
+    @staticmethod
+    def from_arrays(n_agents, n_actions, arrays, prefix='joint_'):
+        obj = JointActionCounts(n_agents, n_actions, int(arrays[f'{prefix}horizon']))
+        obj.times = np.array(arrays[f'{prefix}times'], dtype=np.int64)
+        obj.cells = np.array(arrays[f'{prefix}cells'], dtype=np.int64)
+        obj.counts = np.array(arrays[f'{prefix}counts'], dtype=np.int64)
+        return obj
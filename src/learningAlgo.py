@@ -1,14 +1,29 @@
 import numpy as np
 
-from src.agentSpace import AgentSpace
+from src.agentSpace import AgentSpace, BatchAgentSpace
+from src.policies import TABLES, get_policy
 
 class LearningAlgo:
-    def __init__(self, constant, algo_name, a_space: AgentSpace, noise_param):
+    def __init__(self, constant, algo_name, a_space: AgentSpace, noise_param, rng=None):
         self.constant = constant
         self.algo_name = algo_name
-        self.a_space = a_space
-        self.init_sequence = np.random.permutation(a_space.n_arms)
+        self.rng = rng if rng is not None else np.random
+        self.init_sequence = self.rng.permutation(a_space.n_arms)
         self.noise_param = noise_param
+        self.policy = None
+        self.a_space = a_space
+        self.policy = get_policy(algo_name)(self)
+
+    @property
+    def a_space(self):
+        return self._a_space
+
+    @a_space.setter
+    def a_space(self, a_space):
+        # les statistiques de la politique sont dérivées de l'AgentSpace: reconstruites s'il est remplacé
+        self._a_space = a_space
+        if self.policy is not None:
+            self.policy.reset()
 
     def getInitialState(self):
         first_time = False
@@ -19,98 +34,17 @@ class LearningAlgo:
 
         return {'action': action, 'first_time': first_time }
 
-    def getUCBAction(self, first_time, action):
-        exploration = 1
-        if not first_time:
-            var = max(self.noise_param + .25, 1e-2)
-            est_opt = np.sqrt(8 * var * np.log(self.a_space.t) / self.a_space.plays)
-            action_val = self.a_space.avg_reward + est_opt
-
-            best = np.flatnonzero(action_val == action_val.max())
-            if best.size == 1:
-                action = int(best[0])
-            else:
-                action = int(np.random.choice(best))
-
-            best_greedy = np.flatnonzero(self.a_space.avg_reward == self.a_space.avg_reward.max())
-            exploration = int(action not in best_greedy)
-
-        return action, exploration
-    
-    def getTSAction(self, first_time, action):
-        mu_0 = 1
-        var_0 = 1
-        var = max(self.noise_param + .25, 1e-2)
-        exploration = 1
-        if not first_time:
-            mu_post = (mu_0/var_0 + self.a_space.sums/var) / (1/var_0 + self.a_space.plays/var)
-            var_post = 1 / (1 / var_0 + self.a_space.plays / var)
-            samples = np.random.normal(mu_post, np.sqrt(var_post))
-
-            best = np.flatnonzero(samples == samples.max())
-            if best.size == 1:
-                action = int(best[0])
-            else:
-                action = int(np.random.choice(best))
-
-            best_greedy = np.flatnonzero(mu_post == mu_post.max())
-            exploration =  int(action not in best_greedy)
-
-        return action, exploration
-
-    def getKLUCBAction(self, first_time, action):
-        var = max(self.noise_param + 0.25, 1e-2)
-        c = 3
-        exploration=1
-
-        if not first_time:
-            means = self.a_space.sums / self.a_space.plays
-            f_t = 2 * var * (np.log(self.a_space.t) + c * np.log(np.log(self.a_space.t)))
-            ucbs = means + np.sqrt(f_t / self.a_space.plays)
-
-            best = np.flatnonzero(ucbs == ucbs.max())
-            if best.size == 1:
-                action = int(best[0])
-            else:
-                action = int(np.random.choice(best))
-
-            best_greedy = np.flatnonzero(self.a_space.avg_reward == self.a_space.avg_reward.max())
-            exploration =  int(action not in best_greedy)
-
-        return action, exploration
-
-    def getSoftMaxAction(self, first_time, action):
-        tau = 1 / np.log(self.a_space.t + 1)
-        exploration = 1
-
-        if not first_time:
-            total = np.sum(np.exp(self.a_space.avg_reward / tau))
-
-            rand = np.random.random()
-            probabilities = np.exp(self.a_space.avg_reward / tau) / total
-            cumulative_probabilities = np.cumsum(probabilities)
-            action = np.searchsorted(cumulative_probabilities, rand)
-            best_greedy = np.flatnonzero(self.a_space.avg_reward == self.a_space.avg_reward.max())
-            exploration = int(action not in best_greedy)
-
-        return action, exploration
+    def update(self, action):
+        # appelé par Agent.update une fois le bras joué mis à jour dans l'AgentSpace
+        self.policy.update(action)
 
     def getAction(self):
         res = self.getInitialState()
-        first_time = res['first_time']
-        action = res['action']
-
-        match self.algo_name:
-            case "UCB":
-                return self.getUCBAction(first_time, action)
-            case "TS":
-                return self.getTSAction(first_time, action)
-            case "KLUCB":
-                return self.getKLUCBAction(first_time, action)
-            case "SoftMax":
-                return self.getSoftMaxAction(first_time, action)
-            case _:
-                return None
+        if res['first_time']:
+            return res['action'], 1
+        if self.a_space.t >= TABLES.capacity:
+            TABLES.ensure(self.a_space.t)
+        return self.policy.select(self.a_space.t)
 
     def serialize(self):
         return {
@@ -131,4 +65,36 @@ class LearningAlgo:
             data['noise_param']
         )
         algo.init_sequence = np.array(data['init_sequence'])
-        return algo
\ No newline at end of file
+        return algo
+
+
+class BatchLearningAlgo:
+    def __init__(self, constant, algo_name, a_space: BatchAgentSpace, agent, noise_param, rng):
+        self.constant = constant
+        self.algo_name = algo_name
+        self.a_space = a_space
+        self.agent = agent
+        self.noise_param = noise_param
+        self.rng = rng
+        self.kernel = get_policy(algo_name, batch=True)
+        self.init_sequence = rng.permuted(
+            np.tile(np.arange(a_space.n_arms), (a_space.n_runs, 1)), axis=1
+        )
+
+    def argmaxRandomTies(self, values):
+        best = values == values.max(axis=1, keepdims=True)
+        keys = self.rng.random(values.shape) * best
+        return keys.argmax(axis=1)
+
+    def getExploration(self, action, greedy_values):
+        best_greedy = greedy_values == greedy_values.max(axis=1, keepdims=True)
+        return (~best_greedy[np.arange(action.size), action]).astype(int)
+
+    def getAction(self):
+        n_runs = self.a_space.n_runs
+        if self.a_space.t <= self.a_space.n_arms:
+            return self.init_sequence[:, self.a_space.t-1], np.ones(n_runs, dtype=int)
+
+        if self.a_space.t >= TABLES.capacity:
+            TABLES.ensure(self.a_space.t)
+        return self.kernel(self)
@@ -0,0 +1,180 @@
+import numpy as np
+
+# Registre des algorithmes: un nouvel algorithme s'ajoute avec @register_policy("NOM") (et batch=True pour
+# sa version vectorisée sur les runs), sans toucher à LearningAlgo.
+POLICIES = {}
+BATCH_POLICIES = {}
+
+def register_policy(name, batch=False):
+    def decorator(policy):
+        (BATCH_POLICIES if batch else POLICIES)[name] = policy
+        return policy
+    return decorator
+
+def get_policy(name, batch=False):
+    registry = BATCH_POLICIES if batch else POLICIES
+    if name not in registry:
+        raise ValueError(f"Unknown algorithm: {name}")
+    return registry[name]
+
+class TimeTables:
+    # log t, log log t et tau = 1 / log(t + 1) pour t = 0..capacity-1, calculés une fois pour tout l'horizon
+    # (agrandis par doublement). Les valeurs sont identiques bit à bit à np.log(t) calculé pas à pas.
+    def __init__(self, capacity=1024):
+        self.capacity = 0
+        self.ensure(capacity)
+
+    def ensure(self, t):
+        if t < self.capacity:
+            return
+        capacity = max(2 * self.capacity, t + 1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            log_t = np.log(np.arange(capacity + 1, dtype=float))
+            self.log_t = log_t[:capacity]
+            self.log_log_t = np.log(self.log_t)
+            self.tau = 1 / log_t[1:]
+        self.capacity = capacity
+
+TABLES = TimeTables()
+
+def argmax_random_ties(values, rng):
+    best = np.flatnonzero(values == values.max())
+    if best.size == 1:
+        return int(best[0])
+    return int(rng.choice(best))
+
+class Policy:
+    # Statistiques suffisantes d'un algorithme pour un agent. Elles sont reconstruites depuis l'AgentSpace
+    # (reset) puis tenues à jour bras par bras (update) après chaque récompense.
+    # greedy: valeurs dont l'argmax définit l'action gloutonne (drapeau d'exploration), avec son max courant.
+    def __init__(self, algo):
+        self.algo = algo
+        self.var = max(algo.noise_param + .25, 1e-2)
+        self.reset()
+
+    def reset(self):
+        self.greedy = self.algo.a_space.avg_reward.copy()
+        self.greedy_max = self.greedy.max()
+
+    def set_greedy(self, action, value):
+        previous = self.greedy[action]
+        self.greedy[action] = value
+        if value >= self.greedy_max:
+            self.greedy_max = value
+        elif previous == self.greedy_max:
+            self.greedy_max = self.greedy.max()
+
+    def update(self, action):
+        self.set_greedy(action, self.algo.a_space.avg_reward[action])
+
+    def exploration(self, action):
+        return int(self.greedy[action] != self.greedy_max)
+
+    def select(self, t):
+        raise NotImplementedError
+
+@register_policy("UCB")
+class UCBPolicy(Policy):
+    def reset(self):
+        super().reset()
+        self.coef = 8 * self.var
+
+    def select(self, t):
+        a_space = self.algo.a_space
+        est_opt = np.sqrt(self.coef * TABLES.log_t[t] / a_space.plays)
+        action = argmax_random_ties(a_space.avg_reward + est_opt, self.algo.rng)
+        return action, self.exploration(action)
+
+@register_policy("TS")
+class TSPolicy(Policy):
+    mu_0 = 1
+    var_0 = 1
+
+    def reset(self):
+        a_space = self.algo.a_space
+        self.mu_post = (self.mu_0/self.var_0 + a_space.sums/self.var) / (1/self.var_0 + a_space.plays/self.var)
+        self.std_post = np.sqrt(1 / (1 / self.var_0 + a_space.plays / self.var))
+        self.greedy = self.mu_post
+        self.greedy_max = self.greedy.max()
+
+    def update(self, action):
+        a_space = self.algo.a_space
+        self.std_post[action] = np.sqrt(1 / (1 / self.var_0 + a_space.plays[action] / self.var))
+        self.set_greedy(action, (self.mu_0/self.var_0 + a_space.sums[action]/self.var)
+                        / (1/self.var_0 + a_space.plays[action]/self.var))
+
+    def select(self, t):
+        samples = self.algo.rng.normal(self.mu_post, self.std_post)
+        action = argmax_random_ties(samples, self.algo.rng)
+        return action, self.exploration(action)
+
+@register_policy("KLUCB")
+class KLUCBPolicy(Policy):
+    c = 3
+
+    def reset(self):
+        super().reset()
+        self.coef = 2 * self.var
+
+    def select(self, t):
+        a_space = self.algo.a_space
+        # tous les bras ont été joués une fois (séquence initiale): sums / plays == avg_reward
+        f_t = self.coef * (TABLES.log_t[t] + self.c * TABLES.log_log_t[t])
+        action = argmax_random_ties(a_space.avg_reward + np.sqrt(f_t / a_space.plays), self.algo.rng)
+        return action, self.exploration(action)
+
+@register_policy("SoftMax")
+class SoftMaxPolicy(Policy):
+    def select(self, t):
+        weights = np.exp(self.algo.a_space.avg_reward / TABLES.tau[t])
+        total = np.sum(weights)
+        rand = self.algo.rng.random()
+        cumulative_probabilities = np.cumsum(weights / total)
+        action = np.searchsorted(cumulative_probabilities, rand)
+        return action, self.exploration(action)
+
+# Noyaux vectorisés (BatchLearningAlgo): une décision par run, état en tableaux (runs, bras)
+
+@register_policy("UCB", batch=True)
+def batch_ucb(algo):
+    plays = algo.a_space.plays[:, algo.agent]
+    avg_reward = algo.a_space.avg_reward[:, algo.agent]
+    var = max(algo.noise_param + .25, 1e-2)
+    est_opt = np.sqrt(8 * var * TABLES.log_t[algo.a_space.t] / plays)
+    action = algo.argmaxRandomTies(avg_reward + est_opt)
+    return action, algo.getExploration(action, avg_reward)
+
+@register_policy("TS", batch=True)
+def batch_ts(algo):
+    plays = algo.a_space.plays[:, algo.agent]
+    sums = algo.a_space.sums[:, algo.agent]
+    mu_0 = 1
+    var_0 = 1
+    var = max(algo.noise_param + .25, 1e-2)
+    mu_post = (mu_0/var_0 + sums/var) / (1/var_0 + plays/var)
+    var_post = 1 / (1 / var_0 + plays / var)
+    samples = algo.rng.normal(mu_post, np.sqrt(var_post))
+    action = algo.argmaxRandomTies(samples)
+    return action, algo.getExploration(action, mu_post)
+
+@register_policy("KLUCB", batch=True)
+def batch_klucb(algo):
+    plays = algo.a_space.plays[:, algo.agent]
+    sums = algo.a_space.sums[:, algo.agent]
+    var = max(algo.noise_param + 0.25, 1e-2)
+    c = 3
+    means = sums / plays
+    f_t = 2 * var * (TABLES.log_t[algo.a_space.t] + c * TABLES.log_log_t[algo.a_space.t])
+    action = algo.argmaxRandomTies(means + np.sqrt(f_t / plays))
+    return action, algo.getExploration(action, algo.a_space.avg_reward[:, algo.agent])
+
+@register_policy("SoftMax", batch=True)
+def batch_softmax(algo):
+    avg_reward = algo.a_space.avg_reward[:, algo.agent]
+    weights = np.exp(avg_reward / TABLES.tau[algo.a_space.t])
+    cumulative_probabilities = np.cumsum(weights / weights.sum(axis=1, keepdims=True), axis=1)
+    rand = algo.rng.random(algo.a_space.n_runs)
+    # équivalent vectorisé de np.searchsorted(cumulative_probabilities, rand) par run
+    action = (cumulative_probabilities < rand[:, None]).sum(axis=1)
+    action = np.minimum(action, algo.a_space.n_arms - 1)
+    return action, algo.getExploration(action, avg_reward)
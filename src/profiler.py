@@ -0,0 +1,165 @@
+import os
+import sys
+import json
+import time
+import inspect
+import importlib
+import tracemalloc
+import cProfile
+import threading
+from datetime import datetime, timezone
+
+# Phases instrumentées: (phase, module, fonction ou Classe.méthode). Les temps sont inclusifs
+# (une phase compte aussi les phases qu'elle appelle, p. ex. save_pickle -> serialize, pickle.write).
+PHASES = {
+    'run_results': [
+        ('agent.train', 'src.agent', 'Agent.train'),
+        ('env.updateStep', 'src.environment', 'Environnement.updateStep'),
+        ('env.serialize', 'src.environment', 'Environnement.serialize'),
+        ('env.from_serialized', 'src.environment', 'Environnement.from_serialized'),
+        ('checkpoint.save', 'src.utils', 'save_pickle'),
+        ('checkpoint.segment', 'src.segments', 'SegmentCheckpointer.save'),
+        ('pickle.write', 'src.utils', 'save_pickle_atomic'),
+        ('pickle.read', 'src.utils', 'load_checkpoint'),
+        ('output.aggregate', 'src.utils', 'aggregate_metrics_from_single_pkl'),
+        ('output.write', 'src.utils', 'write_output'),
+        ('output.append', 'src.utils', 'append_output'),
+        ('stats.update', 'src.statsStore', 'StatsStore.update'),
+        ('stats.save', 'src.statsStore', 'StatsStore.save'),
+        ('results.write', 'src.resultStore', 'ResultStore.write'),
+        ('results.mark', 'src.resultStore', 'ResultStore.mark'),
+    ],
+    'generate_figures': [
+        ('stats.load', 'src.runStats', 'load_figure_stats'),
+        ('stats.collect', 'src.runStats', 'collect_stats'),
+        ('stats.results', 'src.runStats', 'stats_from_results'),
+        ('stats.runStats', 'src.runStats', 'runStats'),
+        ('output.read', 'src.utils', 'read_output'),
+        ('stats.to_stats', 'src.runningStats', 'RunningStats.to_stats'),
+        ('figure.regret', 'src.runFigures', 'plot_results'),
+        ('figure.prop', 'src.runFigures', 'plot_action_prop'),
+        ('figure.digest', 'src.runFigures', 'figure_digest'),
+    ],
+}
+
+class Profiler:
+    # Instrumentation par remplacement des fonctions le temps d'une commande (monkeypatch): quand le profilage
+    # est désactivé, rien n'est remplacé et le coût est nul. Chaque phase cumule temps mural, nombre d'appels et,
+    # avec memory=True, le pic tracemalloc (au-dessus de la mémoire tracée à l'entrée) sur l'ensemble des appels.
+    # Avec --workers, seules les phases du processus principal sont mesurées.
+    def __init__(self, folder, command, memory=True, cprofile=False):
+        self.folder = folder
+        self.command = command
+        self.memory = memory
+        self.cprofile = cProfile.Profile() if cprofile else None
+        self.stats = {}
+        self.local = threading.local()
+        self.patches = []
+        self.started = None
+
+    def wrap(self, phase, fn):
+        stats = self.stats.setdefault(phase, {'calls': 0, 'wall_s': 0.0, 'peak_bytes': 0})
+        profiler = self
+
+        def timed(*args, **kwargs):
+            frame = profiler.enter()
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                stats['wall_s'] += time.perf_counter() - start
+                stats['calls'] += 1
+                profiler.leave(stats, frame)
+        timed.__wrapped__ = fn
+        return timed
+
+    @property
+    def stack(self):
+        # une pile de phases par thread: les écritures de fin de run tournent dans un thread d'arrière-plan
+        if not hasattr(self.local, 'stack'):
+            self.local.stack = []
+        return self.local.stack
+
+    def enter(self):
+        if not self.memory:
+            return None
+        current, peak = tracemalloc.get_traced_memory()
+        if self.stack:
+            # le pic de la phase parente jusqu'ici, avant qu'il ne soit remis à zéro pour la phase enfant
+            self.stack[-1][1] = max(self.stack[-1][1], peak)
+        tracemalloc.reset_peak()
+        frame = [current, current]
+        self.stack.append(frame)
+        return frame
+
+    def leave(self, stats, frame):
+        if frame is None:
+            return
+        self.stack.pop()
+        peak = max(frame[1], tracemalloc.get_traced_memory()[1])
+        stats['peak_bytes'] = max(stats['peak_bytes'], peak - frame[0])
+        if self.stack:
+            self.stack[-1][1] = max(self.stack[-1][1], peak)
+
+    def install(self, targets):
+        for phase, module_name, qualname in targets:
+            module = importlib.import_module(module_name)
+            owner, _, attr = qualname.rpartition('.')
+            owner = getattr(module, owner) if owner else module
+            raw = inspect.getattr_static(owner, attr)
+            fn = raw.__func__ if isinstance(raw, staticmethod) else raw
+            wrapped = self.wrap(phase, fn)
+            if owner is module:
+                # les fonctions importées par nom (from src.utils import *) sont remplacées partout
+                for mod in list(sys.modules.values()):
+                    if (getattr(mod, '__name__', '').startswith('src') or mod is sys.modules.get('__main__')):
+                        for name, value in list(vars(mod).items()):
+                            if value is fn:
+                                setattr(mod, name, wrapped)
+                                self.patches.append((mod, name, fn))
+            else:
+                setattr(owner, attr, staticmethod(wrapped) if isinstance(raw, staticmethod) else wrapped)
+                self.patches.append((owner, attr, raw))
+
+    def __enter__(self):
+        self.install(PHASES[self.command])
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        self.started = time.perf_counter()
+        if self.cprofile is not None:
+            self.cprofile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # aussi après une interruption (Ctrl-C): le profil de ce qui a tourné est écrit
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        total = time.perf_counter() - self.started
+        for owner, attr, original in reversed(self.patches):
+            setattr(owner, attr, original)
+        self.patches = []
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.write(total, interrupted=exc_type is not None)
+        return False
+
+    def write(self, total, interrupted=False):
+        stamp = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        os.makedirs(self.folder, exist_ok=True)
+        path = os.path.join(self.folder, "profile.jsonl")
+        with open(path, "a") as f:
+            for phase, stats in sorted(self.stats.items(), key=lambda item: -item[1]['wall_s']):
+                if not stats['calls']:
+                    continue
+                record = {'timestamp': stamp, 'command': self.command, 'phase': phase, 'calls': stats['calls'],
+                          'wall_s': stats['wall_s'], 'mean_s': stats['wall_s'] / stats['calls']}
+                if self.memory:
+                    record['peak_kib'] = stats['peak_bytes'] / 1024
+                f.write(json.dumps(record) + "\n")
+            f.write(json.dumps({'timestamp': stamp, 'command': self.command, 'phase': 'total', 'calls': 1,
+                                'wall_s': total, 'interrupted': interrupted}) + "\n")
+        print(f"📝 Saved profile: {path}")
+        if self.cprofile is not None:
+            prof_path = os.path.join(self.folder, f"profile_{self.command}_{stamp.replace(':', '')}.prof")
+            self.cprofile.dump_stats(prof_path)
+            print(f"📝 Saved cProfile dump: {prof_path} (python -m pstats {prof_path})")
@@ -0,0 +1,208 @@
+import os
+import re
+import json
+import numpy as np
+
+from src.utils import METRICS, load_checkpoint
+
+class ResultStore:
+    # Trajectoires de toute l'expérience dans un seul fichier projeté en mémoire (np.memmap), de forme
+    # runs × jeux × agents × métriques × T: la série d'un (run, jeu, agent, métrique) est un segment contigu,
+    # lu sans copie. En-tête JSON (titres, dtype, forme, pas écrits par run) dans un bloc réservé en tête.
+    # Un fichier par suffixe d'extension de jeux, comme les sorties: results{suffix}.dat.
+    magic = b"RLFWRES1"
+    version = 1
+    align = 4096
+
+    def __init__(self, path, header, mode='r'):
+        self.path = path
+        self.header = header
+        self.mode = mode
+        self.data = None
+        self.map()
+
+    @staticmethod
+    def path_for(folder, suffix=''):
+        return os.path.join(folder, f"results{suffix}.dat")
+
+    @property
+    def shape(self):
+        return tuple(self.header['shape'])
+
+    @property
+    def titles(self):
+        return self.header['titles']
+
+    @property
+    def suffix(self):
+        return self.header['suffix']
+
+    @property
+    def n_agents(self):
+        return self.shape[2]
+
+    @property
+    def offset(self):
+        return len(self.magic) + 8 + self.header['header_size']
+
+    def map(self):
+        self.data = np.memmap(self.path, dtype=self.header['dtype'], mode=self.mode, offset=self.offset,
+                              shape=self.shape)
+
+    @staticmethod
+    def read_header(path):
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            if f.read(len(ResultStore.magic)) != ResultStore.magic:
+                return None
+            size = int.from_bytes(f.read(8), 'little')
+            return json.loads(f.read(size).decode())
+
+    @staticmethod
+    def write_header(path, header):
+        encoded = json.dumps(header).encode()
+        with open(path, "r+b") as f:
+            f.write(ResultStore.magic + header['header_size'].to_bytes(8, 'little'))
+            f.write(encoded.ljust(header['header_size']))
+
+    @staticmethod
+    def fit_header(header):
+        # bloc d'en-tête aligné pour que les données commencent sur une page, avec de la marge pour 'filled'
+        prefix = len(ResultStore.magic) + 8
+        needed = 2 * len(json.dumps(header).encode()) + prefix
+        header['header_size'] = -(-needed // ResultStore.align) * ResultStore.align - prefix
+        return header
+
+    def save_header(self):
+        if len(json.dumps(self.header).encode()) > self.header['header_size']:
+            # en-tête devenu trop grand (beaucoup de runs): recopie avec un bloc plus grand
+            self.relayout(self.shape[0], self.shape[-1])
+        else:
+            self.write_header(self.path, self.header)
+
+    @staticmethod
+    def allocate(path, header):
+        # fichier creux de la taille finale: les runs non écrits ne prennent pas de place sur disque
+        header = ResultStore.fit_header(header)
+        with open(path, "wb") as f:
+            f.truncate(len(ResultStore.magic) + 8 + header['header_size']
+                       + int(np.prod(header['shape'])) * np.dtype(header['dtype']).itemsize)
+        ResultStore.write_header(path, header)
+        return ResultStore(path, header, 'r+')
+
+    @staticmethod
+    def open(path, mode='r'):
+        header = ResultStore.read_header(path)
+        if header is None or header['version'] != ResultStore.version:
+            return None
+        return ResultStore(path, header, mode)
+
+    @staticmethod
+    def open_all(folder):
+        if not os.path.isdir(folder):
+            return []
+        stores = [ResultStore.open(os.path.join(folder, fname))
+                  for fname in sorted(os.listdir(folder)) if re.fullmatch(r"results.*\.dat", fname)]
+        return [store for store in stores if store is not None]
+
+    @staticmethod
+    def prepare(folder, suffix, titles, n_actions, n_agents, runs, horizon):
+        # ouvre (et agrandit) le fichier de l'expérience, ou le recrée si les jeux ne correspondent plus;
+        # les runs déjà terminés y sont alors recopiés depuis leurs checkpoints (plan_units)
+        path = ResultStore.path_for(folder, suffix)
+        store = ResultStore.open(path, 'r+')
+        if store is None or store.titles != titles or store.n_agents != n_agents:
+            return ResultStore.allocate(path, {
+                'version': ResultStore.version, 'dtype': '<f8', 'metrics': list(METRICS), 'suffix': suffix,
+                'titles': titles, 'n_actions': n_actions, 'shape': [runs, len(titles), n_agents, len(METRICS), horizon],
+                'filled': [0] * runs})
+        store.grow(runs, horizon)
+        return store
+
+    def grow(self, runs, horizon):
+        n_runs, n_games, n_agents, n_metrics, n_time = self.shape
+        if horizon > n_time:
+            self.relayout(max(runs, n_runs), horizon)
+        elif runs > n_runs:
+            # add_runs: les runs sont l'axe externe, il suffit d'allonger le fichier
+            self.data = None
+            self.header['shape'][0] = runs
+            self.header['filled'] += [0] * (runs - n_runs)
+            with open(self.path, "r+b") as f:
+                f.truncate(self.offset + int(np.prod(self.shape)) * np.dtype(self.header['dtype']).itemsize)
+            self.map()
+            self.save_header()
+
+    def relayout(self, runs, horizon):
+        # add_horizon: T est l'axe interne, le fichier est recopié run par run avec le nouvel horizon
+        n_runs, n_games, n_agents, n_metrics, n_time = self.shape
+        header = {**self.header, 'shape': [runs, n_games, n_agents, n_metrics, horizon],
+                  'filled': self.header['filled'] + [0] * (runs - n_runs)}
+        tmp_path = self.path + ".tmp"
+        new = ResultStore.allocate(tmp_path, header)
+        for r in range(n_runs):
+            if self.header['filled'][r]:
+                new.data[r, ..., :n_time] = self.data[r]
+        new.data.flush()
+        new.data = None
+        self.data = None
+        os.replace(tmp_path, self.path)
+        self.header = new.header
+        self.map()
+
+    def write(self, r, g, start, plays, rewards, regrets, explorations):
+        # pas [start, start + n) d'un jeu du run r, chaque métrique de forme (n_agents, n)
+        stop = start + rewards.shape[1]
+        block = self.data[r, g]
+        for m, values in enumerate((plays, rewards, regrets, explorations)):
+            block[:, m, start:stop] = values
+
+    def mark(self, r, steps, games=None):
+        # le run r est valide jusqu'à steps une fois les données sur disque; games: jeux du run s'il n'a pas
+        # tous les jeux (mode adaptatif)
+        self.data.flush()
+        self.header['filled'][r] = steps
+        partial = self.header.setdefault('partial', {})
+        if games is not None and len(games) < len(self.titles):
+            partial[str(r)] = list(games)
+        else:
+            partial.pop(str(r), None)
+        self.save_header()
+
+    def run_games(self, r):
+        return self.header.get('partial', {}).get(str(r), list(range(len(self.titles))))
+
+    def covers(self, r, horizon):
+        return r < self.shape[0] and self.header['filled'][r] >= horizon
+
+    def update_from_checkpoint(self, pkl_file, r):
+        cp = load_checkpoint(pkl_file)
+        entries = {}
+        for entry in cp['metrics']:
+            entries.setdefault(entry['title'], []).append(entry)
+        for title, title_entries in entries.items():
+            self.write(r, self.titles.index(title), 0,
+                       *(np.stack([entry[metric] for entry in title_entries])
+                         for metric in ('play', 'reward', 'regret', 'exploration')))
+        self.mark(r, len(cp['metrics'][0]['reward']), sorted(self.titles.index(title) for title in entries))
+
+    def run_key(self, r):
+        return f"run{r}{self.suffix}"
+
+    def filled_runs(self):
+        # même ordre que les fichiers de sortie (tri par nom), pour des agrégats identiques
+        return sorted((r for r, steps in enumerate(self.header['filled']) if steps), key=self.run_key)
+
+    def run_keys(self):
+        return {self.run_key(r) for r in self.filled_runs()}
+
+    def series(self, r, title, agent, metric):
+        return self.data[r, self.titles.index(title), agent, METRICS.index(metric), :self.header['filled'][r]]
+
+    def run_values(self, r, title):
+        # vues (n_agents, T) sur le fichier, sauf les actions converties en entiers
+        block = self.data[r, self.titles.index(title), :, :, :self.header['filled'][r]]
+        values = {metric: block[:, m] for m, metric in enumerate(METRICS)}
+        values['play'] = values['play'].astype(np.int64)
+        return values
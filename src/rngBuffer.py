@@ -0,0 +1,125 @@
+import math
+import numpy as np
+
+class RngStream:
+    # Un bloc de tirages pré-générés d'un même type ('normal': N(0, 1), 'uniform': U[0, 1)).
+    # start_state = état de la source juste avant le tirage du bloc: avec offset, il suffit pour reconstruire
+    # exactement le bloc et la position courante à la reprise.
+    def __init__(self, kind):
+        self.kind = kind
+        self.values = np.zeros(0)
+        self.items = []
+        self.size = 0
+        self.offset = 0
+        self.start_state = None
+
+    def fill(self, source, size, state):
+        self.start_state = state
+        self.values = source.standard_normal(size) if self.kind == 'normal' else source.random(size)
+        self.items = self.values.tolist()
+        self.size = size
+        self.offset = 0
+
+class RngBuffer:
+    # Couche de tirages par blocs devant un générateur: un appel scalaire ne coûte qu'un accès à une liste
+    # au lieu d'un appel à numpy. Les valeurs sont transformées à l'usage (loc + scale * z, a[int(u * n)]).
+    # source: np.random.Generator, ou le module np.random (état global) dans le mode historique.
+    # Les tirages diffèrent de ceux d'un générateur non tamponné, mais restent reproductibles à la reprise.
+    def __init__(self, source, block_size):
+        self.source = source
+        self.block_size = block_size
+        self.normals = RngStream('normal')
+        self.uniforms = RngStream('uniform')
+
+    def source_state(self):
+        if isinstance(self.source, np.random.Generator):
+            return self.source.bit_generator.state
+        return self.source.get_state()
+
+    def replay_source(self, state):
+        # générateur indépendant positionné sur state, pour redessiner un bloc sans toucher à la source
+        if isinstance(self.source, np.random.Generator):
+            source = np.random.Generator(type(self.source.bit_generator)())
+            source.bit_generator.state = state
+        else:
+            source = np.random.RandomState()
+            source.set_state(state)
+        return source
+
+    def refill(self, stream, n):
+        # le reste du bloc courant est abandonné: un bloc est toujours consommé d'un seul tenant par tirage
+        stream.fill(self.source, max(self.block_size, n), self.source_state())
+
+    def take(self, stream, n):
+        if stream.offset + n > stream.size:
+            self.refill(stream, n)
+        values = stream.values[stream.offset:stream.offset + n]
+        stream.offset += n
+        return values
+
+    def next_value(self, stream):
+        if stream.offset >= stream.size:
+            self.refill(stream, 1)
+        stream.offset += 1
+        return stream.items[stream.offset - 1]
+
+    def normal(self, loc=0.0, scale=1.0, size=None):
+        loc_is_array, scale_is_array = isinstance(loc, np.ndarray), isinstance(scale, np.ndarray)
+        if size is None and not loc_is_array and not scale_is_array:
+            stream = self.normals
+            if stream.offset >= stream.size:
+                self.refill(stream, 1)
+            stream.offset += 1
+            return loc + scale * stream.items[stream.offset - 1]
+        if size is not None:
+            shape = tuple(np.atleast_1d(size))
+        elif loc_is_array and scale_is_array and loc.shape != scale.shape:
+            shape = np.broadcast_shapes(loc.shape, scale.shape)
+        else:
+            shape = loc.shape if loc_is_array else scale.shape
+        return loc + scale * self.take(self.normals, math.prod(shape)).reshape(shape)
+
+    def random(self, size=None):
+        if size is None:
+            return self.next_value(self.uniforms)
+        shape = tuple(np.atleast_1d(size))
+        return self.take(self.uniforms, math.prod(shape)).reshape(shape)
+
+    def choice(self, a):
+        # tirage uniforme d'un élément (départage des égalités); avec des blocs de 1, tiré par la source comme
+        # sans tampon, pour que rng_buffer: 1 reproduise exactement les tirages non tamponnés
+        if self.block_size == 1:
+            return self.source.choice(a)
+        return a[int(self.next_value(self.uniforms) * len(a))]
+
+    def __getattr__(self, name):
+        # tirages ponctuels (permutation initiale, ...) faits directement par la source
+        if 'source' not in self.__dict__:
+            raise AttributeError(name)
+        return getattr(self.__dict__['source'], name)
+
+    def serialize(self):
+        return {
+            'block_size': self.block_size,
+            # l'état global de np.random est déjà sauvegardé par le checkpoint du run
+            'source_state': self.source_state() if isinstance(self.source, np.random.Generator) else None,
+            'streams': {
+                stream.kind: {'start_state': stream.start_state, 'size': stream.size, 'offset': stream.offset}
+                for stream in (self.normals, self.uniforms)
+            },
+        }
+
+    @staticmethod
+    def from_serialized(data):
+        if data['source_state'] is not None:
+            source = np.random.default_rng()
+            source.bit_generator.state = data['source_state']
+        else:
+            source = np.random
+        buffer = RngBuffer(source, data['block_size'])
+        for stream in (buffer.normals, buffer.uniforms):
+            state = data['streams'][stream.kind]
+            if state['start_state'] is not None:
+                stream.fill(buffer.replay_source(state['start_state']), state['size'], state['start_state'])
+                stream.offset = state['offset']
+        return buffer
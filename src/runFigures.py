@@ -1,16 +1,42 @@
 import os
-import itertools
+import json
+import hashlib
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import matplotlib.pyplot as plt
 import numpy as np
-import seaborn as sns
 
 from src.utils import parse_string
-from src.runStats import runStats
+from src.runStats import load_figure_stats, stats_for_title
+from src.jointActions import JointActionCounts
+from src.downsample import downsample
 
-sns.set_theme(style="whitegrid", palette="colorblind")
-sns.despine(trim=True)
+FIGURE_INDEX = "figures.json"
+RENDER_VERSION = 1  # à incrémenter quand le rendu change, pour refaire toutes les figures
+styled = False
 
-def plot_results(games, save_folder, compare, suffix):
+def set_style():
+    # thème et rcParams appliqués au premier tracé (dans chaque worker), pas à l'import du module
+    global styled
+    if styled:
+        return
+    import seaborn as sns
+    sns.set_theme(style="whitegrid", palette="colorblind")
+    sns.despine(trim=True)
+    plt.rcParams.update({
+        "text.usetex": False,
+        "font.family": "serif",
+        "font.serif": ["Times New Roman"],
+        "figure.dpi": 300,
+        "font.size": 8,
+        "axes.titlesize": 8,
+        "axes.labelsize": 8,
+        "xtick.labelsize": 8,
+        "ytick.labelsize": 8,
+        "legend.fontsize": 8
+    })
+    styled = True
+
+def plot_results(games, path, compare, method=None, max_points=None):
     plt.figure(figsize=(5, 3))
     for game in games:
         title = game['experiment']
@@ -19,18 +45,15 @@ def plot_results(games, save_folder, compare, suffix):
         algos, noise, game = parse_string(title)
         algos_arr = algos.split('x')
         n_rounds = len(mean)
-        x = np.arange(n_rounds)
         sep = r"$\times$"
         noiseLegend = f'noise {noise}'
         line = plt.plot(
-            x,
-            mean,
+            *downsample(mean, method, max_points),
             label=f"{sep.join(algos_arr) if compare == 'algos' else noiseLegend}",
             linewidth=1,
         )
         plt.plot(
-            x,
-            mean + std,
+            *downsample(mean + std, method, max_points),
             linestyle='--',
             alpha=0.5,
             color=line[0].get_color(),
@@ -48,29 +71,33 @@ def plot_results(games, save_folder, compare, suffix):
     legend.get_frame().set_linewidth(0)
     legend.get_frame().set_facecolor('white')
     plt.tight_layout()
-    fileN = f"{game}_{noise}" if compare == 'algos' else f"{game}_compare_noise{algos}"
-    plt.savefig(f"{save_folder}/{fileN}{suffix}.pdf", dpi=300)
+    plt.savefig(path, dpi=300)
     plt.close()
 
-def plot_action_prop(games, save_folder, suffix):
+def plot_action_prop(games, path, window=None, top_k=None, method=None, max_points=None):
+    # window: proportions glissantes sur les window derniers pas; top_k: seules les k actions jointes
+    # les plus jouées sont tracées, les autres sont regroupées dans une courbe "other"
     plt.figure(figsize=(5, 3))
     for game in games:
         title = game['experiment']
-        props = game['metrics']['vecteur_de_props']
-        [n_actions, n_agents] = game['shape']
-        labels = list(itertools.product(range(1, n_actions + 1), repeat=n_agents))
+        joint = game['metrics']['joint_actions']
+        if top_k:
+            codes, props, other = joint.top_k(game['runs'], top_k, window)
+        else:
+            codes, props, other = joint.codes, joint.proportions(game['runs'], window), None
+        labels = joint.labels(codes)
         algos, noise, game = parse_string(title)
         algos_arr = algos.split('x')
         n_rounds = props.shape[0]
-        x = np.arange(n_rounds)
 
         for i in range(props.shape[1]):
             plt.plot(
-                x,
-                props[:, i],
-                label=labels[i],
+                *downsample(props[:, i], method, max_points),
+                label=str(labels[i]),
                 linewidth=1,
         )
+        if other is not None:
+            plt.plot(*downsample(other, method, max_points), label="other", linewidth=1, color="grey")
 
     sep = r"$\times$"
     ax = plt.gca()
@@ -88,34 +115,103 @@ def plot_action_prop(games, save_folder, suffix):
         frameon=False
     )
     plt.tight_layout()
-    plt.savefig(f"{save_folder}/{game}_{algos}_{noise}{suffix}.pdf", dpi=300)
+    plt.savefig(path, dpi=300)
     plt.close()
 
-plt.rcParams.update({
-    "text.usetex": False,
-    "font.family": "serif",
-    "font.serif": ["Times New Roman"],
-    "figure.dpi": 300,
-    "font.size": 8,
-    "axes.titlesize": 8,
-    "axes.labelsize": 8,
-    "xtick.labelsize": 8,
-    "ytick.labelsize": 8,
-    "legend.fontsize": 8
-})
+def figure_file(cumul_y, games, compare, suffix):
+    # nom du PDF d'après le dernier jeu de la figure
+    algos, noise, game = parse_string(games[-1]['experiment'])
+    if cumul_y == 'prop':
+        return f"{game}_{algos}_{noise}{suffix}.pdf"
+    fileN = f"{game}_{noise}" if compare == 'algos' else f"{game}_compare_noise{algos}"
+    return f"{fileN}{suffix}.pdf"
 
-def generate_fig(cumul_y, algos, noise, name, n_actions, folder, suffix):
-    games, games_result = [], []
+def figure_job(cumul_y, algos, noise, name, folder, suffix, stats, window=None, top_k=None, method=None,
+               max_points=None):
+    # tout ce qu'il faut pour tracer une figure, sans matplotlib: envoyé tel quel à un worker
+    cache, subDir = stats
+    games_result = []
     for algo in algos:
         for n in noise:
             algoCombo = "×".join(algo)
-            games.append(f"{algoCombo}_0.0_{n}_{name}")
-    for g in games:
-        res, subDir = runStats(f"{folder}/output/", g, n_actions)
-        games_result.append(res)
-    newDir = f"{folder}/{cumul_y}/{subDir}"
-    os.makedirs(newDir, exist_ok=True)
-    if cumul_y == 'regret':
-        plot_results(games_result, newDir, 'algos' if len(algos) > 1 else 'noise', suffix)
-    elif cumul_y == 'prop':
-        plot_action_prop(games_result, newDir, suffix)
\ No newline at end of file
+            games_result.append(stats_for_title(cache, f"{algoCombo}_0.0_{n}_{name}"))
+    compare = 'algos' if len(algos) > 1 else 'noise'
+    return {'cumul_y': cumul_y, 'games': games_result, 'compare': compare, 'window': window, 'top_k': top_k,
+            'method': method, 'max_points': max_points,
+            'path': f"{folder}/{cumul_y}/{subDir}/{figure_file(cumul_y, games_result, compare, suffix)}"}
+
+def render_figure(job):
+    set_style()
+    os.makedirs(os.path.dirname(job['path']), exist_ok=True)
+    if job['cumul_y'] == 'regret':
+        plot_results(job['games'], job['path'], job['compare'], job['method'], job['max_points'])
+    elif job['cumul_y'] == 'prop':
+        plot_action_prop(job['games'], job['path'], job['window'], job['top_k'], job['method'], job['max_points'])
+    return job['path']
+
+def figure_digest(job):
+    # empreinte des données et des options d'une figure (les séries sont hachées en binaire)
+    digest = hashlib.sha256(f"v{RENDER_VERSION}".encode())
+    def feed(value):
+        if isinstance(value, dict):
+            for key in sorted(value):
+                digest.update(str(key).encode())
+                feed(value[key])
+        elif isinstance(value, JointActionCounts):
+            feed(dict(value.to_arrays(), n_agents=value.n_agents))
+        elif isinstance(value, np.ndarray) or (isinstance(value, list) and value
+                                                and isinstance(value[0], (int, float, np.number))):
+            array = np.asarray(value)
+            digest.update(f"{array.dtype}{array.shape}".encode())
+            digest.update(np.ascontiguousarray(array).tobytes())
+        elif isinstance(value, list):
+            digest.update(f"[{len(value)}".encode())
+            for item in value:
+                feed(item)
+        else:
+            digest.update(repr(value).encode())
+    feed(job)
+    return digest.hexdigest()
+
+def render_figures(jobs, folder, workers=None, force=False):
+    # Ne trace que les figures dont les données ou les options ont changé depuis le dernier rendu
+    # ({folder}/figures.json: empreinte par PDF), dans un pool de processus avec --workers.
+    index_path = os.path.join(folder, FIGURE_INDEX)
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path, "r") as f:
+            index = json.load(f)
+    # une même figure demandée deux fois n'est tracée qu'une fois (la dernière l'emporte, comme en séquentiel)
+    jobs = {job['path']: job for job in jobs}
+    todo = []
+    for path, job in jobs.items():
+        key = os.path.relpath(path, folder)
+        digest = figure_digest(job)
+        if not force and index.get(key) == digest and os.path.exists(path):
+            continue
+        todo.append((key, digest, job))
+    try:
+        if workers is None or workers <= 1 or len(todo) <= 1:
+            for key, digest, job in todo:
+                render_figure(job)
+                index[key] = digest
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(render_figure, job): (key, digest) for key, digest, job in todo}
+                for future in as_completed(futures):
+                    future.result()
+                    key, digest = futures[future]
+                    index[key] = digest
+    finally:
+        tmp_path = index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, index_path)
+    print(f"🖼️ Rendered {len(todo)} figure(s), {len(jobs) - len(todo)} unchanged.")
+
+def generate_fig(cumul_y, algos, noise, name, n_actions, folder, suffix, stats=None, window=None, top_k=None,
+                 method=None, max_points=None):
+    # stats: résultat de load_figure_stats partagé entre toutes les figures d'un même dossier
+    if stats is None:
+        stats = load_figure_stats(folder, n_actions)
+    render_figure(figure_job(cumul_y, algos, noise, name, folder, suffix, stats, window, top_k, method, max_points))
\ No newline at end of file
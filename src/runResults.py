@@ -1,10 +1,20 @@
 import yaml
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, as_completed, wait
 from pathlib import Path
 
-from src.execute import Execute
+from src.execute import Execute, BatchExecute
 from src.utils import *
 from src.environment import Environnement
+from src.segments import SegmentCheckpointer, restore_segments, compact_segments
+from src.statsStore import StatsStore
+from src.resultStore import ResultStore
+from src.rngBuffer import RngBuffer
+from src.telemetry import Telemetry, completed_steps
+from src.sweep import expand_games
+from src.adaptive import AdaptiveStopping
+from src.runWriter import RunWriter
 
 root = Path(__file__).resolve().parent.parent
 LAST_ACTIVE_RUN = Path("last_active_run.txt")
@@ -12,7 +22,7 @@ LAST_ACTIVE_RUN = Path("last_active_run.txt")
 def get_last_active_run():
     try:
         with open("last_active_run.txt", "r") as f:
-            return int(f.read().strip()) - 1
+            return int(f.read().strip())
     except FileNotFoundError:
         return None
 
@@ -21,7 +31,8 @@ def open_config(config_path):
         config = yaml.safe_load(f)
 
     defaults = config['defaults']
-    games = config['games']
+    # jeux écrits à la main et section sweep, un niveau de bruit par jeu
+    games = expand_games(config)
 
     horizon = defaults['horizon']
     runs = defaults['runs']
@@ -30,7 +41,7 @@ def open_config(config_path):
     folder = f"{root}/{defaults['save_folder']}"
     return games, horizon, runs, player, seed, folder, config
 
-def run_results(suffix):
+def run_results(suffix, batch_size=0, workers=None):
     config_path = root / "config.yaml"
     games, horizon, runs, player, seed, folder, config = open_config(config_path)
     last_run_csv = Path(f"../Figures/{folder}/output/run{runs-1}.csv")
@@ -70,94 +81,420 @@ def run_results(suffix):
             m_games[f"game{next_idx}"] = v
             next_idx += 1
         m_config['games'] = m_games
+        # m_games contient déjà le développement de la section sweep du manifeste
+        m_config.pop('sweep', None)
         with open(manifest, "w") as f:
             yaml.safe_dump(m_config, f, sort_keys=False, allow_unicode=True)
     else:
+        # les arrêts adaptatifs déjà décidés restent dans le manifeste
+        previous = Path(f"{folder}/config.yaml")
+        if previous.exists():
+            with open(previous, "r") as f:
+                adaptive_results = (yaml.safe_load(f) or {}).get('adaptive_results')
+            if adaptive_results is not None:
+                config['adaptive_results'] = adaptive_results
         with open(f"{folder}/config.yaml", 'w') as f:
             yaml.safe_dump(config, f, sort_keys=False, allow_unicode=True)
 
+    output_format = config['defaults'].get('output_format', 'csv')
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format: {output_format}")
     last_run_id = get_last_active_run()
     if last_run_id is not None:
         print(f"Regenerating CSV for run {last_run_id} before resuming...")
-        recover_last_csv(f"{folder}/pkl/", last_run_id)
+        recover_last_csv(f"{folder}/pkl/", last_run_id, output_format)
     else:
         print("No previous run to recover.")
 
-    for r in range(runs):
-        set_rng_for_run(r, seed_base=seed, pkl_path=folder)
-        # Récupérer le csv pour le dernier run pour s'assurer des données complètes et correctes
-        with open(LAST_ACTIVE_RUN, "w") as f:
-            f.write(str(r))
+    # checkpoints intermédiaires (segments) tous les N pas ou toutes les M secondes à l'intérieur d'un run
+    checkpointing = (config['defaults'].get('checkpoint_every_steps', 0),
+                     config['defaults'].get('checkpoint_every_seconds', 0))
+    # tenseurs des jeux construits une fois par expérience; game_cache: true les garde aussi sur disque
+    game_cache = f"{folder}/game_cache" if config['defaults'].get('game_cache', False) else None
+    game_specs = [build_game_matrices(games[f'game{g + 1}'], player, game_cache) for g in range(len(games))]
+    # agrégats de l'expérience mis à jour run par run (figures sans relire les sorties)
+    store = StatsStore.load(folder)
+    # trajectoires de tous les runs dans un fichier projeté en mémoire (result_store: true)
+    results = prepare_result_store(config, games, game_specs, folder, suffix, player, runs, horizon)
+    # arrêt adaptatif (adaptive: {tolerance, ...}): runs par vagues, jeux arrêtés une fois la précision atteinte
+    adaptive = AdaptiveStopping.from_config(config['defaults'].get('adaptive'), game_titles(games), horizon,
+                                            config.get('adaptive_results'))
+    waves = [list(range(runs))] if adaptive is None else adaptive.waves(runs)
+    run_games = None if adaptive is None else adaptive.games_for_run
+    # avancement, débit et ETA dans {folder}/status.json
+    telemetry = Telemetry(folder, runs, len(games), horizon, completed_steps(folder, runs, suffix, len(games), horizon),
+                          config['defaults'].get('status_every_seconds', 10), suffix)
+    if adaptive is not None:
+        telemetry.drop_steps(sum(max(runs - adaptive.stop_runs(title), 0) for title in adaptive.titles) * horizon)
+    try:
+        for run_ids in waves:
+            # runs qui ont encore des jeux: les runs 0..n-1 d'un jeu arrêté après n runs sont toujours étendus
+            if adaptive is not None:
+                run_ids = [r for r in run_ids if adaptive.games_for_run(r)]
+                if not run_ids:
+                    break
+            units = plan_units(games, game_specs, horizon, runs, player, seed, folder, suffix, extend_games, batch_size,
+                               workers, checkpointing, output_format, store, config['defaults'].get('rng_buffer', 0),
+                               results, run_ids, run_games)
+            # checkpoints et sorties écrits en arrière-plan, au plus write_queue runs en attente (0: immédiatement)
+            collect_runs(execute_units(schedule_units(units, workers), workers), games, game_specs, folder, suffix,
+                         horizon, player, output_format, store, telemetry, results,
+                         config['defaults'].get('write_queue', 2))
+            if adaptive is not None:
+                stop_converged_games(adaptive, store, folder, suffix, telemetry, runs, horizon, run_ids[-1] + 1)
+    except KeyboardInterrupt:
+        telemetry.close('interrupted')
+        raise
+    except Exception:
+        telemetry.close('failed')
+        raise
+    telemetry.close('finished')
+    if LAST_ACTIVE_RUN.exists():
+        LAST_ACTIVE_RUN.unlink()
+
+def game_titles(games):
+    return [Execute.game_title(game['algos'], game['noise'][0], game['name'])
+            for game in (games[f'game{g + 1}'] for g in range(len(games)))]
+
+def stop_converged_games(adaptive, store, folder, suffix, telemetry, runs, horizon, frontier):
+    # un jeu ne s'arrête que si aucun run au-delà de la vague n'est commencé (reprise, add_horizon): sinon ces
+    # runs le contiennent déjà et les jeux d'un run ne seraient plus 0..n-1
+    started = any((Path(folder) / "pkl" / f"cp_run{r}{suffix}.pkl").exists() for r in range(frontier, runs))
+    for title, n in adaptive.update(store, can_stop=not started):
+        print(f"🎯 {title}: stopped after {n} runs "
+              f"(± {adaptive.games[title]['half_width']:.4g} at {adaptive.confidence:.0%})")
+        telemetry.drop_steps(max(runs - n, 0) * horizon)
+    # précision atteinte par jeu, dans le manifeste de l'expérience
+    manifest = Path(f"{folder}/config.yaml")
+    with open(manifest, "r") as f:
+        config = yaml.safe_load(f)
+    config['adaptive_results'] = adaptive.to_manifest()
+    with open(manifest, "w") as f:
+        yaml.safe_dump(config, f, sort_keys=False, allow_unicode=True)
+
+def prepare_result_store(config, games, game_specs, folder, suffix, player, runs, horizon):
+    path = ResultStore.path_for(folder, suffix)
+    if not config['defaults'].get('result_store', False):
+        if os.path.exists(path):
+            # plus tenu à jour: les figures ne doivent pas lire des trajectoires périmées
+            os.remove(path)
+            print(f"🗑️ Removed result store (result_store is off): {path}")
+        return None
+    return ResultStore.prepare(folder, suffix, game_titles(games), [spec[1] for spec in game_specs], player, runs, horizon)
+
+def write_run(job):
+    # thread d'écriture: checkpoint puis sortie, produite depuis le checkpoint en mémoire
+    r, folder, suffix = job['r'], job['folder'], job['suffix']
+    # Récupérer le csv pour le dernier run pour s'assurer des données complètes et correctes
+    with open(LAST_ACTIVE_RUN, "w") as f:
+        f.write(str(r))
+    cp = save_pickle(folder, r, job['metrics'], job['envs'], suffix=suffix, rng_state=job['rng_state'])
+    compact_segments(folder, r, suffix)
+    # après add_horizon, seuls les nouveaux pas de temps sont ajoutés à la sortie du run
+    aggregate_metrics_from_single_pkl(str(Path(folder) / "pkl" / f"cp_run{r}{suffix}.pkl"), job['output_format'], cp)
+
+def record_run(job, game_specs, horizon, store, telemetry, results=None):
+    # processus principal, une fois le checkpoint écrit: agrégats, trajectoires et télémétrie du run
+    r, start_iter, run_games = job['r'], job['start_iter'], job['run_games']
+    # depuis les métriques fusionnées du checkpoint: les environnements d'anciens checkpoints n'ont pas les
+    # actions ni les explorations des pas déjà faits (remplies de zéros par from_serialized)
+    for position, (g, title) in enumerate(zip(run_games, job['titles'])):
+        plays, rewards, regrets, exploration_list = run_game_metrics(job['metrics'], position, len(run_games))
+        store.update(title, f"run{r}{job['suffix']}", game_specs[g][1], plays, rewards, regrets, exploration_list)
+    store.save()
+    if results is not None:
+        # seuls les nouveaux pas sont écrits, en place, si le fichier a déjà les précédents; sinon (result_store
+        # activé après coup puis add_horizon) tout le run, depuis les métriques fusionnées du checkpoint
+        start = start_iter if results.covers(r, start_iter) else 0
+        for position, g in enumerate(run_games):
+            plays, rewards, regrets, exploration_list = run_game_metrics(job['metrics'], position, len(run_games))
+            results.write(r, g, start, plays[:, start:], rewards[:, start:], regrets[:, start:],
+                          exploration_list[:, start:])
+        results.mark(r, horizon, run_games)
+    telemetry.run_done(r, (horizon - start_iter) * len(run_games), job['write_s'])
 
-        # logique pour soit une nouvelle expérience soit une extension d'une expérience
+def collect_runs(units, games, game_specs, folder, suffix, horizon, player, output_format, store, telemetry,
+                 results=None, max_pending=0):
+    # regroupe les jeux de chaque run au fil des unités terminées, puis checkpoint, sortie et agrégats du run.
+    # Un run ne contient que ses jeux (run_games: tous, sauf ceux arrêtés par le mode adaptatif), dans l'ordre.
+    # Avec max_pending > 0, checkpoint et sortie sont écrits en arrière-plan pendant la simulation des runs suivants.
+    collected = {}
+    writer = RunWriter(write_run, max_pending)
+    try:
+        for result in units:
+            telemetry.unit_done(next(iter(result['results'].values()))[4], result['runs'], result['steps'],
+                                result['elapsed'])
+            for r in result['runs']:
+                entry = collected.setdefault(r, {'state': result['states'][r], 'games': {},
+                                                 'run_games': result['run_games']})
+                entry['games'][result['g']] = result['results'][r]
+                if len(entry['games']) < len(entry['run_games']):
+                    continue
+                del collected[r]
+                start_iter, _, all_games_metrics_for_run = entry['state']
+                run_games = entry['run_games']
+                titles, env_list = [], []
+                for position, g in enumerate(run_games):
+                    title, env = entry['games'][g][4:]
+                    titles.append(title)
+                    env_list.append(env)
+                    # les jeux repris depuis un segment ont démarré plus tard: on relit tout depuis start_iter
+                    regrets, rewards, plays, exploration_list = env.trajectory.view(start_iter, horizon)
+                    merge_game_metrics(all_games_metrics_for_run, position, r, player, len(run_games), title,
+                                       game_specs[g][1], start_iter, regrets, rewards, plays, exploration_list)
+                # l'état global du RNG est pris maintenant: le run suivant le fait avancer pendant l'écriture
+                writer.submit({'r': r, 'folder': folder, 'suffix': suffix, 'output_format': output_format,
+                               'start_iter': start_iter, 'run_games': run_games, 'titles': titles,
+                               'metrics': all_games_metrics_for_run, 'envs': env_list,
+                               'rng_state': np.random.get_state()})
+            for job in writer.finished():
+                record_run(job, game_specs, horizon, store, telemetry, results)
+    finally:
+        # runs en attente écrits avant de rendre la main, même sur Ctrl-C; ceux déjà écrits sont enregistrés
+        # même si le thread d'écriture a échoué (l'erreur est propagée ensuite)
+        try:
+            writer.close()
+        finally:
+            for job in writer.finished():
+                record_run(job, game_specs, horizon, store, telemetry, results)
+
+def plan_units(games, game_specs, horizon, runs, player, seed, folder, suffix, extend_games, batch_size, workers,
+               checkpointing=(0, 0), output_format='csv', store=None, rng_buffer=0, results=None, run_ids=None,
+               run_games=None):
+    # Une unité de travail = (run, jeu), ou (lot de runs, jeu) en mode batch.
+    # Sans --workers ni --batch_size, l'état global de np.random est semé ou restauré par run comme avant.
+    # run_ids: runs à planifier (tous par défaut); run_games(r): indices des jeux du run r (tous par défaut).
+    global_rng = workers is None and batch_size == 0
+    run_games = run_games or (lambda r: list(range(len(games))))
+    pending = defaultdict(list)
+    folded = False
+    for r in range(runs) if run_ids is None else run_ids:
         pkl_file = Path(folder) / "pkl" / f"cp_run{r}{suffix}.pkl"
-        csv_file = Path(folder) / "output" / f"run{r}{suffix}.csv"
+        output_file = Path(folder) / "output" / f"run{r}{suffix}{OUTPUT_FORMATS[output_format]}"
+        if run_is_complete(pkl_file, output_file, len(run_games(r)), horizon, output_format):
+            # run terminé mais absent des agrégats (interruption juste après le checkpoint, ancienne expérience)
+            if store is not None and not store.covers(f"run{r}{suffix}", horizon) and pkl_file.exists():
+                store.update_from_checkpoint(pkl_file, f"run{r}{suffix}")
+                folded = True
+            if results is not None and not results.covers(r, horizon) and pkl_file.exists():
+                results.update_from_checkpoint(pkl_file, r)
+            continue
+        pending[run_start_iter(pkl_file, extend_games)].append(r)
+    if folded:
+        store.save()
 
-        lengths = get_pickle_len(pkl_file) if pkl_file.exists() else (0,0,0,0)
-        rew_len, reg_len, play_len, exp_len = lengths
-        csv_complete = is_csv_complete(csv_file, len(games), horizon)
+    if batch_size > 0:
+        # les runs d'un même lot doivent partir de la même itération
+        chunks = [(rs[b:b + batch_size], start_iter)
+                  for start_iter, rs in sorted(pending.items())
+                  for b in range(0, len(rs), batch_size)]
+    else:
+        chunks = sorted(([r], start_iter) for start_iter, rs in pending.items() for r in rs)
+
+    for batch, start_iter in chunks:
+        states = {}
+        for r in batch:
+            if global_rng:
+                set_rng_for_run(r, seed_base=seed, pkl_path=folder)
+            states[r] = load_run_state(Path(folder) / "pkl" / f"cp_run{r}{suffix}.pkl", extend_games, len(games),
+                                       run_games(r))
+            if batch_size == 0:
+                # reprendre les jeux interrompus en cours de run à partir de leurs segments
+                envs, segment_rng = restore_segments(folder, r, suffix, start_iter, states[r][1])
+                states[r] = (states[r][0], envs, states[r][2])
+                if global_rng and segment_rng is not None:
+                    np.random.set_state(segment_rng)
+        for g in run_games(batch[0]):
+            envs = [states[r][1][g] for r in batch]
+            game_start = start_iter
+            checkpointer = None
+            if batch_size == 0:
+                game_start = 0 if envs[0] is None else envs[0].trajectory.length
+                if any(checkpointing):
+                    checkpointer = SegmentCheckpointer(folder, batch[0], suffix, g, *checkpointing,
+                                                       save_global_rng=global_rng)
+            if not global_rng:
+                envs = [None if env is None else env.serialize() for env in envs]
+            unit = {
+                'runs': batch,
+                'g': g,
+                'game': games[f'game{g + 1}'],
+                'matrices': game_specs[g][0],
+                'n_actions': game_specs[g][1],
+                'player': player,
+                'horizon': horizon,
+                'n_runs': runs,
+                'start_iter': game_start,
+                'envs': envs,
+                'checkpointer': checkpointer,
+                'seed': seed,
+                'batch': batch_size > 0,
+                'global_rng': global_rng,
+                'rng_buffer': rng_buffer,
+                'run_games': run_games(batch[0]),
+            }
+            yield unit, states
+
+def unit_cost(unit):
+    # coût estimé d'une unité: pas à simuler × agents × bras
+    return (unit['horizon'] - unit['start_iter']) * len(unit['runs']) * unit['player'] * unit['n_actions']
+
+def schedule_units(units, workers):
+    # Avec plusieurs workers, les unités d'une vague de `workers` runs (ou lots) partent des plus coûteuses aux
+    # moins coûteuses pour équilibrer la charge; les vagues suivent l'ordre des runs pour que les checkpoints
+    # avancent run par run. Sans --workers, l'ordre (et donc l'état global de np.random) est inchangé.
+    if workers is None or workers <= 1:
+        yield from units
+        return
+    wave, batches = [], set()
+    for unit, states in units:
+        batch = tuple(unit['runs'])
+        if batch not in batches and len(batches) == workers:
+            yield from sorted(wave, key=lambda item: -unit_cost(item[0]))
+            wave, batches = [], set()
+        batches.add(batch)
+        wave.append((unit, states))
+    yield from sorted(wave, key=lambda item: -unit_cost(item[0]))
+
+def unit_rng(unit, env):
+    # Flux indépendant par unité, dérivé de la graine et des indices run/jeu:
+    # les résultats ne dépendent pas du nombre de workers.
+    r, g, start_iter = unit['runs'][0], unit['g'], unit['start_iter']
+    if unit['batch']:
+        return np.random.default_rng(np.random.SeedSequence(unit['seed'], spawn_key=(g, r, len(unit['runs']), start_iter)))
+    if env is not None and isinstance(env.rng, np.random.Generator):
+        return env.rng
+    spawn_key = (r, g) if start_iter == 0 else (r, g, start_iter)
+    return np.random.default_rng(np.random.SeedSequence(unit['seed'], spawn_key=spawn_key))
 
+def simulate_unit(unit):
+    started = time.perf_counter()
+    game, player, n_actions = unit['game'], unit['player'], unit['n_actions']
+    envs = unit['envs']
+    if not unit['global_rng']:
+        envs = [None if env is None else Environnement.from_serialized(env) for env in envs]
+
+    if unit['batch']:
+        results = BatchExecute(len(unit['runs']), unit['horizon'], player, [None] * player, game['name'], n_actions,
+                               unit_rng(unit, None)).run_games(
+            unit['start_iter'], None if envs[0] is None else envs, unit['matrices'], game['algos'], 'normal', game['noise'][0])
+    else:
+        rng = None if unit['global_rng'] else unit_rng(unit, envs[0])
+        if unit['rng_buffer'] and envs[0] is None:
+            # un environnement restauré garde son propre tampon (ou son absence de tampon)
+            rng = RngBuffer(np.random if rng is None else rng, unit['rng_buffer'])
+        results = [Execute(unit['n_runs'], unit['horizon'], player, [None] * player, game['name'], n_actions).run_one_game(
+            unit['start_iter'], envs[0], unit['matrices'], game['algos'], 'normal', game['noise'][0], rng,
+            unit['checkpointer'])]
+
+    if not unit['global_rng']:
+        results = [(*res[:5], res[5].serialize()) for res in results]
+    return {'runs': unit['runs'], 'g': unit['g'], 'results': dict(zip(unit['runs'], results)),
+            'steps': (unit['horizon'] - unit['start_iter']) * len(unit['runs']),
+            'elapsed': time.perf_counter() - started}
+
+def execute_units(units, workers):
+    # Les états de run (métriques) restent dans le processus principal; seuls les environnements sérialisés
+    # voyagent vers les workers.
+    def finish(result, unit, states):
+        if not unit['global_rng']:
+            result['results'] = {r: (*res[:5], Environnement.from_serialized(res[5]))
+                                 for r, res in result['results'].items()}
+        result['states'] = states
+        result['run_games'] = unit['run_games']
+        return result
+
+    if workers is None or workers <= 1:
+        for unit, states in units:
+            yield finish(simulate_unit(unit), unit, states)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = {}
+        for unit, states in units:
+            in_flight[pool.submit(simulate_unit, unit)] = (unit, states)
+            if len(in_flight) >= 2 * workers:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield finish(future.result(), *in_flight.pop(future))
+        for future in as_completed(list(in_flight)):
+            yield finish(future.result(), *in_flight.pop(future))
+
+def run_is_complete(pkl_file, output_file, n_games, horizon, output_format='csv'):
+    manifest = read_manifest(pkl_file)
+    if manifest is None:
+        # checkpoint sans manifeste (ancienne expérience): on inspecte le pkl une fois, la sortie régénérée écrit le manifeste
+        lengths = get_pickle_len(pkl_file) if pkl_file.exists() else (0,0,0,0)
         if all(x >= horizon for x in lengths):
-            if not csv_complete:
-                aggregate_metrics_from_single_pkl(str(pkl_file))
-            continue
-        # étendre l'horizon
-        if pkl_file.exists() and not extend_games:
-            with open(pkl_file, "rb") as f:
-                state = pickle.load(f)
-            start_iter = rew_len
-            env_state_list = [Environnement.from_serialized(env_state) for env_state in state['env_state']]
-            all_games_metrics_for_run = state['metrics']
+            aggregate_metrics_from_single_pkl(str(pkl_file), output_format)
+            return True
+        return False
+    if manifest['horizon'] < horizon:
+        return False
+    if len(manifest['games']) < n_games or not output_matches(manifest, output_format, output_file):
+        aggregate_metrics_from_single_pkl(str(pkl_file), output_format)
+    return True
+
+def run_start_iter(pkl_file, extend_games):
+    if not pkl_file.exists() or extend_games:
+        return 0
+    manifest = read_manifest(pkl_file)
+    return manifest['horizon'] if manifest is not None else get_pickle_len(pkl_file)[0]
+
+def load_run_state(pkl_file, extend_games, n_games, run_games=None):
+    # logique pour soit une nouvelle expérience soit une extension d'une expérience
+    if pkl_file.exists() and not extend_games:
+        # étendre l'horizon; les environnements du checkpoint (jeux du run, dans l'ordre) sont rangés par jeu
+        state = load_checkpoint(pkl_file)
+        start_iter = get_checkpoint_len(state)[0]
+        env_state_list = [None] * n_games
+        for position, g in enumerate(range(n_games) if run_games is None else run_games):
+            env_state_list[g] = Environnement.from_serialized(state['env_state'][position])
+        return start_iter, env_state_list, state['metrics']
+    return 0, [None] * n_games, []
+
+def build_game_matrices(game, player, cache_dir=None):
+    raw = game["matrix"]
+    arr = np.array(raw, dtype=float)
+
+    if arr.ndim == 2:
+        matrix = arr
+        n_actions = matrix.shape[1]
+        matrices_norm = build_n_player_game('diag' if is_diagonal(matrix) else 'general', player, matrix, cache_dir)
+    elif arr.ndim == 3:
+        matrices = [np.array(m, dtype=float) for m in raw]
+        n_actions = matrices[0].shape[1]
+        matrices_norm = [normalizeMatrix(mat, 0) for mat in matrices]
+
+    return matrices_norm, n_actions
+
+def run_game_metrics(metrics, position, n_games):
+    # (plays, rewards, regrets, explorations) du jeu à la position donnée du run, de forme (agents, T), depuis t=0
+    player = len(metrics) // n_games
+    entries = metrics[position * player:(position + 1) * player]
+    return tuple(np.stack([entry[metric] for entry in entries]) for metric in METRICS)
+
+def merge_game_metrics(all_games_metrics_for_run, g, r, player, n_games, title, n_actions, start_iter,
+                       regrets, rewards, plays, exploration_list):
+    for agent_id in range(player):
+        metrics_dict = {
+            "play": plays[agent_id],
+            "reward": rewards[agent_id],
+            "regret": regrets[agent_id],
+            "exploration": exploration_list[agent_id],
+        }
+
+        index = player * g + agent_id
+        if len(all_games_metrics_for_run) < (n_games * player):
+            all_games_metrics_for_run.append(metrics_entry(
+                title=title,
+                player=f"agent_{agent_id}",
+                instance=r,
+                n_actions=n_actions,
+                metrics_dict=metrics_dict
+            ))
         else:
-            start_iter = 0
-            env_state_list = [None] * len(games)
-            all_games_metrics_for_run = []
-
-        env_list = []
-        for g in range(len(games)):
-            game = games[f'game{g + 1}']
-            raw = game["matrix"]
-            arr = np.array(raw, dtype=float)
-
-            if arr.ndim == 2:
-                matrix = arr
-                n_actions = matrix.shape[1]
-                matrices = generate_n_player_diag(player, n_actions, matrix) if is_diagonal(matrix) else generate_n_player(
-                    player, n_actions, matrix)
-            elif arr.ndim == 3:
-                matrices = [np.array(m, dtype=float) for m in raw]
-                n_actions = matrices[0].shape[1]
-
-            matrices_norm = [normalizeMatrix(mat, 0) for mat in matrices]
-
-            regrets, rewards, plays, exploration_list, title, env = (
-                Execute(runs, horizon, player, [None] * player, game['name'], n_actions).run_one_game(start_iter, env_state_list[g], matrices_norm, game['algos'], 'normal', game['noise'][0]))
-            env_list.append(env)
-            for agent_id in range(player):
-                metrics_dict = {
-                    "play_time": plays[agent_id].tolist(),
-                    "reward_time": rewards[agent_id].tolist(),
-                    "regret_time": regrets[agent_id].tolist(),
-                    "exploration_time": exploration_list[agent_id].tolist(),
-                }
-
-                index = player * g + agent_id
-                if len(all_games_metrics_for_run) < (len(games) * player):
-                    flattened = flatten_metrics(
-                        title=title,
-                        player=f"agent_{agent_id}",
-                        instance=r,
-                        n_actions=n_actions,
-                        start=start_iter,
-                        metrics_dict=metrics_dict
-                    )
-                    all_games_metrics_for_run.append(flattened)
-                else:
-                    for key, val in metrics_dict.items():
-                        for t, value in enumerate(val):
-                            all_games_metrics_for_run[index][f"{key}{t + start_iter}"] = value
-
-        save_pickle(folder, r, all_games_metrics_for_run, env_list, suffix=suffix)
-        aggregate_metrics_from_single_pkl(str(pkl_file))
-    if LAST_ACTIVE_RUN.exists():
-        LAST_ACTIVE_RUN.unlink()
\ No newline at end of file
+            # étendre l'horizon: simple concaténation des nouveaux pas
+            entry = all_games_metrics_for_run[index]
+            for key, val in metrics_dict.items():
+                entry[key] = np.concatenate([entry[key][:start_iter], val])
@@ -1,94 +1,191 @@
-import numpy as np
-import pandas as pd
 import os
 import re
+import pickle
+import hashlib
+from collections import defaultdict
+
+from src.utils import is_output_file, output_columns, output_parts, read_output, save_pickle_atomic
+from src.runningStats import RunningStats
+from src.statsStore import StatsStore
+from src.resultStore import ResultStore
+
+STATS_CACHE_VERSION = 2  # à incrémenter quand la forme du cache change
+HEAD_BYTES = 4096  # début des fichiers de sortie comparé pour reconnaître un run prolongé
 
 def check_horizon_or_raise(horizon_by_file):
     if len(set(horizon_by_file.values())) > 1:
         raise RuntimeError("Mismatch in horizon - Experiment must be complete for horizon to generate figures.")
 
+def run_files(folder_path):
+    # fichiers de sortie des runs, triés; même erreur que pour un jeu absent s'il n'y en a aucun
+    files = sorted(fname for fname in os.listdir(folder_path) if is_output_file(fname)) \
+        if os.path.isdir(folder_path) else []
+    if not files:
+        raise ValueError(f"No data found in {folder_path}: no run output files")
+    return files
+
 def runStats(folder_path, game, n_actions):
+    # Les runs sont intégrés un par un (Welford) au lieu d'être empilés: mémoire bornée par agents × horizon.
+    run_files(folder_path)
+    stores = covering_result_stores(folder_path)
+    if stores:
+        stats = stats_from_results(stores, n_actions, game)
+        if game not in stats['titles']:
+            raise ValueError(f"No data found for game: {game}")
+        check_horizon_or_raise(stats['horizons'][game])
+        run_ids = [int(re.search(r"run(\d+)", fname).group(1)) for fname in os.listdir(folder_path) if is_output_file(fname)]
+        return stats['titles'][game].to_stats(game), f"run{max(run_ids)}"
     metrics_base = ['play', 'reward', 'regret', 'exploration']
-    collected = {m: [] for m in metrics_base}
+    acc = None
     run_ids = []
     horizon_by_file = {}
 
     for fname in sorted(os.listdir(folder_path)):
-        if fname.endswith(".csv"):
+        if is_output_file(fname):
             match = re.search(r"run(\d+)", fname)
             run_ids.append(int(match.group(1)))
 
-            df = pd.read_csv(os.path.join(folder_path, fname))
-            df_game = df[df['title'] == game]
+            path = os.path.join(folder_path, fname)
+            agent_cols_by_metric = {
+                metric: [col for col in output_columns(path) if col.startswith(f"{metric}_agent_")]
+                for metric in metrics_base
+            }
+            columns = ['title', 'time_step'] + [col for cols in agent_cols_by_metric.values() for col in cols]
+            df_game = read_output(path, columns=columns, title=game)
             df_game = df_game.sort_values(by="time_step").reset_index(drop=True)
             if df_game.empty:
                 continue
 
             horizon_by_file[fname] = int(df_game['time_step'].nunique())
-            agent_cols_by_metric = {
-                metric: [col for col in df.columns if col.startswith(f"{metric}_agent_")]
-                for metric in metrics_base
-            }
-
-            for metric, cols in agent_cols_by_metric.items():
-                values = df_game[cols].to_numpy().T  # shape: (n_agents, n_time_steps)
-                collected[metric].append(values)
-    if not any(collected.values()):
+            values = {metric: df_game[cols].to_numpy().T  # shape: (n_agents, n_time_steps)
+                      for metric, cols in agent_cols_by_metric.items()}
+            n_agents, n_time = values['play'].shape
+            if acc is None:
+                acc = RunningStats(n_agents, n_actions, n_time)
+            if n_time != acc.horizon:
+                continue  # signalé par check_horizon_or_raise
+            acc.add_run(values['play'], values['reward'], values['regret'], values['exploration'])
+    if acc is None:
         raise ValueError(f"No data found for game: {game}")
 
     check_horizon_or_raise(horizon_by_file)
 
-    stacked = {
-        metric: np.stack(collected[metric])
-        for metric in metrics_base
-    }
-
-    plays_arr = stacked["play"]
-    rewards_arr = stacked["reward"]
-    regrets_arr = stacked["regret"]
-    explorations_arr = stacked["exploration"]
-    cum_regrets_arr = regrets_arr.cumsum(axis=2)
-
-    n_ins, n_agents, n_time = plays_arr.shape
-
-    mean_r = rewards_arr.mean(axis=0)
-    std_r = rewards_arr.std(axis=0)
-    mean_reg = cum_regrets_arr.mean(axis=0)
-    std_reg = cum_regrets_arr.std(axis=0)
-    mean_exploration = explorations_arr.mean(axis=0)
+    return acc.to_stats(game), f"run{max(run_ids)}"
 
-    stats = {
-        'experiment': game,
-        'shape': [n_actions, n_agents],
-        'metrics': {}
+def read_run_by_title(path):
+    # une seule lecture du fichier de sortie, découpée par titre
+    metrics_base = ['play', 'reward', 'regret', 'exploration']
+    df = read_output(path)
+    agent_cols_by_metric = {
+        metric: [col for col in df.columns if col.startswith(f"{metric}_agent_")]
+        for metric in metrics_base
     }
-
-    for name, arr in [
-        ('mean_reward', mean_r),
-        ('std_reward', std_r),
-        ('mean_cum_regret', mean_reg),
-        ('std_cum_regret', std_reg),
-        ('mean_exploration', mean_exploration),
-    ]:
-        stats['metrics'][name] = {
-            f'agent_{i}': arr[i].tolist()
-            for i in range(n_agents)
-        }
-
-    # Calculate joint action frequencies
-    base = np.array([n_actions ** p for p in reversed(range(n_agents))])
-    actions = np.moveaxis(plays_arr, 1, -1)  # (n_ins, n_time, n_agents)
-    paire_action = np.tensordot(actions, base, axes=([2], [0])) + 1
-    paire_action = paire_action.astype(int)
-    ids = np.arange(1, n_actions ** n_agents + 1)
-    vecteur_de_props = np.zeros((paire_action.shape[1], ids.size), dtype=float)
-
-    for j in range(n_ins):
-        for r in range(n_time):
-            id_val = paire_action[j, r]
-            vecteur_de_props[r, id_val - 1] += 1
-
-    vecteur_de_props /= n_ins
-    stats["metrics"]["vecteur_de_props"] = vecteur_de_props
-
-    return stats, f"run{max(run_ids)}"
\ No newline at end of file
+    for title, df_game in df.groupby('title', sort=False):
+        df_game = df_game.sort_values(by="time_step")
+        yield title, {metric: df_game[cols].to_numpy().T for metric, cols in agent_cols_by_metric.items()}
+
+def head_digest(path, size):
+    with open(path, "rb") as f:
+        return hashlib.sha1(f.read(min(size, HEAD_BYTES))).hexdigest()
+
+def part_signature(path):
+    st = os.stat(path)
+    return st.st_size, st.st_mtime_ns, head_digest(path, st.st_size)
+
+def appended(old, parts):
+    # le run n'a fait que grandir: add_horizon ajoute des lignes ou des parties sans réécrire les précédentes
+    return len(parts) >= len(old) and all(
+        os.path.getsize(path) >= size and head_digest(path, size) == head for (size, _, head), path in zip(old, parts))
+
+def collect_stats(folder_path, n_actions):
+    # Statistiques de tous les titres en un seul passage sur le dossier de sortie, mises en cache sur disque.
+    # Le cache est indexé par (taille, mtime, début) des fichiers de chaque run et garde, comme StatsStore, le
+    # nombre de pas déjà intégrés par titre et par run (horizons): un run ajouté est intégré, un run prolongé
+    # (add_horizon) n'apporte que ses nouveaux pas. Seul un fichier supprimé ou réécrit force une reconstruction.
+    cache_path = os.path.join(folder_path, "..", "stats_cache.pkl")
+    parts, signatures = {}, {}
+    for fname in run_files(folder_path):
+        parts[fname] = output_parts(os.path.join(folder_path, fname))
+        signatures[fname] = tuple(map(part_signature, parts[fname]))
+
+    cache = None
+    if os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            cache = pickle.load(f)
+    if (cache is None or cache.get('version') != RunningStats.version
+            or cache.get('cache_version') != STATS_CACHE_VERSION or cache['n_actions'] != n_actions
+            or any(fname not in parts or not appended(sig, parts[fname])
+                   for fname, sig in cache['files'].items())):
+        cache = {'version': RunningStats.version, 'cache_version': STATS_CACHE_VERSION, 'n_actions': n_actions,
+                 'files': {}, 'titles': {}, 'horizons': defaultdict(dict)}
+
+    changed = [fname for fname, sig in signatures.items() if cache['files'].get(fname) != sig]
+    for fname in changed:
+        for title, values in read_run_by_title(os.path.join(folder_path, fname)):
+            n_agents, horizon = values['play'].shape
+            start = cache['horizons'][title].get(fname, 0)
+            if horizon <= start:
+                continue
+            acc = cache['titles'].get(title)
+            if acc is None:
+                acc = cache['titles'][title] = RunningStats(n_agents, n_actions, horizon)
+            # horizons différents entre runs: incohérence signalée à la lecture
+            acc.add_run(values['play'], values['reward'], values['regret'], values['exploration'], start)
+            cache['horizons'][title][fname] = horizon
+        cache['files'][fname] = signatures[fname]
+    if changed:
+        save_pickle_atomic(cache_path, cache)
+
+    run_ids = [int(re.search(r"run(\d+)", fname).group(1)) for fname in signatures]
+    return cache, f"run{max(run_ids)}"
+
+def covering_result_stores(folder_path):
+    # fichiers de trajectoires (result_store) s'ils contiennent tous les runs du dossier de sortie
+    run_keys = {os.path.splitext(fname)[0] for fname in os.listdir(folder_path) if is_output_file(fname)}
+    stores = ResultStore.open_all(os.path.join(folder_path, ".."))
+    if not stores or not run_keys <= set().union(*(store.run_keys() for store in stores)):
+        return []
+    return stores
+
+def stats_from_results(stores, n_actions, title=None):
+    # mêmes agrégats que collect_stats, en lisant les séries directement dans les fichiers projetés
+    stats = {'titles': {}, 'horizons': defaultdict(dict)}
+    for store in stores:
+        for game in store.titles if title is None else [title] if title in store.titles else []:
+            for r in store.filled_runs():
+                if store.titles.index(game) not in store.run_games(r):
+                    continue  # jeu arrêté avant ce run (mode adaptatif)
+                values = store.run_values(r, game)
+                n_agents, horizon = values['play'].shape
+                stats['horizons'][game][store.run_key(r)] = horizon
+                acc = stats['titles'].get(game)
+                if acc is None:
+                    acc = stats['titles'][game] = RunningStats(n_agents, n_actions, horizon)
+                if acc.horizon != horizon:
+                    continue  # signalé par check_horizon_or_raise
+                acc.add_run(values['play'], values['reward'], values['regret'], values['exploration'])
+    return stats
+
+def load_figure_stats(folder, n_actions):
+    # Agrégats tenus à jour par run_results s'ils couvrent tous les runs présents, sinon les trajectoires
+    # du result_store, sinon un passage sur les sorties
+    output_folder = f"{folder}/output/"
+    store = StatsStore.load(folder)
+    files = run_files(output_folder)
+    run_keys = {os.path.splitext(fname)[0] for fname in files}
+    if store.titles and run_keys <= store.run_keys():
+        run_ids = [int(re.search(r"run(\d+)", fname).group(1)) for fname in files]
+        return store, f"run{max(run_ids)}"
+    stores = covering_result_stores(output_folder)
+    if stores:
+        run_ids = [int(re.search(r"run(\d+)", fname).group(1)) for fname in files]
+        return stats_from_results(stores, n_actions), f"run{max(run_ids)}"
+    return collect_stats(output_folder, n_actions)
+
+def stats_for_title(cache, game):
+    if isinstance(cache, StatsStore):
+        return cache.to_stats(game)
+    if game not in cache['titles']:
+        raise ValueError(f"No data found for game: {game}")
+    check_horizon_or_raise(cache['horizons'][game])
+    return cache['titles'][game].to_stats(game)
@@ -0,0 +1,65 @@
+import queue
+import time
+import threading
+
+class RunWriter:
+    # Écritures de fin de run (checkpoint, segments, sortie) dans un thread d'arrière-plan pendant que le processus
+    # principal simule la suite. La file est bornée à max_pending runs: submit bloque quand elle est pleine, ce qui
+    # borne la mémoire. Les runs écrits sont rendus dans l'ordre par finished(); close() attend la fin des
+    # écritures, aussi après Ctrl-C, pour garder les garanties de reprise. max_pending=0: écriture immédiate.
+    def __init__(self, write, max_pending=2):
+        self.write = write
+        self.written = queue.Queue()
+        self.error = None
+        self.jobs = None
+        self.thread = None
+        if max_pending > 0:
+            self.jobs = queue.Queue(maxsize=max_pending)
+            # daemon: un second Ctrl-C pendant close() n'attend pas la fin (les écritures restent atomiques)
+            self.thread = threading.Thread(target=self.loop, name="run-writer", daemon=True)
+            self.thread.start()
+
+    def run(self, job):
+        start = time.perf_counter()
+        self.write(job)
+        job['write_s'] = time.perf_counter() - start
+        self.written.put(job)
+
+    def loop(self):
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                return
+            # après une erreur, les runs suivants ne sont pas écrits: ils seront simulés à nouveau à la reprise
+            if self.error is None:
+                try:
+                    self.run(job)
+                except BaseException as error:
+                    self.error = error
+
+    def raise_error(self):
+        if self.error is not None:
+            error, self.error = self.error, None
+            raise error
+
+    def submit(self, job):
+        self.raise_error()
+        if self.thread is None:
+            self.run(job)
+        else:
+            self.jobs.put(job)
+
+    def finished(self):
+        # runs écrits depuis le dernier appel
+        self.raise_error()
+        jobs = []
+        while not self.written.empty():
+            jobs.append(self.written.get())
+        return jobs
+
+    def close(self):
+        if self.thread is not None:
+            self.jobs.put(None)
+            self.thread.join()
+            self.thread = None
+        self.raise_error()
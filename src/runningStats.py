@@ -0,0 +1,106 @@
+import numpy as np
+
+from src.jointActions import JointActionCounts
+
+class RunningStats:
+    # Agrégation en flux (Welford) des runs d'un titre: mémoire O(agents × horizon), quel que soit le nombre de runs.
+    # Le nombre de runs est tenu par pas de temps pour pouvoir prolonger l'horizon run par run (add_horizon).
+    version = 5
+    fields = ('mean_reward', 'm2_reward', 'mean_cum_regret', 'm2_cum_regret', 'mean_exploration')
+
+    def __init__(self, n_agents, n_actions, horizon=0):
+        self.n_agents = n_agents
+        self.n_actions = n_actions
+        self.count = np.zeros(horizon, dtype=np.int64)
+        for name in self.fields:
+            setattr(self, name, np.zeros((n_agents, horizon)))
+        self.joint = JointActionCounts(n_agents, n_actions, horizon)
+
+    @property
+    def horizon(self):
+        return self.count.size
+
+    @property
+    def n(self):
+        return int(self.count.max()) if self.horizon else 0
+
+    def grow(self, horizon):
+        extra = horizon - self.horizon
+        if extra <= 0:
+            return
+        self.count = np.concatenate([self.count, np.zeros(extra, dtype=np.int64)])
+        for name in self.fields:
+            setattr(self, name, np.pad(getattr(self, name), ((0, 0), (0, extra))))
+        self.joint.grow(horizon)
+
+    @staticmethod
+    def welford(n, mean, m2, x):
+        delta = x - mean
+        mean += delta / n
+        m2 += delta * (x - mean)
+
+    def add_run(self, plays, rewards, regrets, explorations, start=0):
+        # chaque métrique: (n_agents, T) pour un run depuis t=0; seuls les pas [start, T) sont intégrés
+        n_time = rewards.shape[1]
+        self.grow(n_time)
+        steps = slice(start, n_time)
+        self.count[steps] += 1
+        n = self.count[steps]
+        self.welford(n, self.mean_reward[:, steps], self.m2_reward[:, steps], rewards[:, steps])
+        self.welford(n, self.mean_cum_regret[:, steps], self.m2_cum_regret[:, steps], regrets.cumsum(axis=1)[:, steps])
+        self.mean_exploration[:, steps] += (explorations[:, steps] - self.mean_exploration[:, steps]) / n
+        self.joint.add_plays(plays, start)
+
+    def merge(self, other):
+        # combinaison de deux agrégats (Chan et al.), p. ex. calculés par des processus différents
+        self.grow(other.horizon)
+        other.grow(self.horizon)
+        n_a, n_b = self.count, other.count
+        n = n_a + n_b
+        safe_n = np.maximum(n, 1)
+        for mean_name, m2_name in [('mean_reward', 'm2_reward'), ('mean_cum_regret', 'm2_cum_regret')]:
+            mean_a, mean_b = getattr(self, mean_name), getattr(other, mean_name)
+            delta = mean_b - mean_a
+            getattr(self, m2_name)[:] += getattr(other, m2_name) + delta ** 2 * n_a * n_b / safe_n
+            mean_a += delta * n_b / safe_n
+        self.mean_exploration += (other.mean_exploration - self.mean_exploration) * n_b / safe_n
+        self.joint.merge(other.joint)
+        self.count = n
+
+    def to_arrays(self):
+        arrays = {name: getattr(self, name) for name in self.fields}
+        arrays['count'] = self.count
+        arrays.update(self.joint.to_arrays())
+        return arrays
+
+    @staticmethod
+    def from_arrays(n_agents, n_actions, arrays):
+        obj = RunningStats(n_agents, n_actions)
+        for name in RunningStats.fields + ('count',):
+            setattr(obj, name, np.array(arrays[name]))
+        obj.joint = JointActionCounts.from_arrays(n_agents, n_actions, arrays)
+        return obj
+
+    def to_stats(self, experiment):
+        # seuls les pas couverts par tous les runs: chaque courbe reste une moyenne sur les mêmes runs
+        n = self.n
+        n_time = int(np.argmin(self.count == n)) if (self.count < n).any() else self.horizon
+        stats = {
+            'experiment': experiment,
+            'shape': [self.n_actions, self.n_agents],
+            'runs': n,
+            'metrics': {}
+        }
+        for name, arr in [
+            ('mean_reward', self.mean_reward),
+            ('std_reward', np.sqrt(self.m2_reward / n)),
+            ('mean_cum_regret', self.mean_cum_regret),
+            ('std_cum_regret', np.sqrt(self.m2_cum_regret / n)),
+            ('mean_exploration', self.mean_exploration),
+        ]:
+            stats['metrics'][name] = {
+                f'agent_{i}': arr[i, :n_time].tolist()
+                for i in range(self.n_agents)
+            }
+        stats['metrics']['joint_actions'] = self.joint.truncate(n_time)
+        return stats
@@ -0,0 +1,124 @@
+import os
+import re
+import time
+import pickle
+import shutil
+import numpy as np
+
+from src.utils import save_pickle_atomic
+from src.trajectory import Trajectory
+from src.environment import Environnement
+
+# Checkpoints intermédiaires d'un run: chaque segment ne contient que la tranche de trajectoire
+# depuis le segment précédent et l'état courant de l'environnement (sans sa trajectoire).
+SEGMENT_PATTERN = re.compile(r"g(\d+)_(\d+)\.pkl$")
+
+def segment_dir(folder, r, suffix):
+    return f"{folder}/pkl/cp_run{r}{suffix}.segments"
+
+class SegmentCheckpointer:
+    def __init__(self, folder, r, suffix, g, every_steps=0, every_seconds=0, save_global_rng=False):
+        self.directory = segment_dir(folder, r, suffix)
+        self.g = g
+        self.every_steps = every_steps
+        self.every_seconds = every_seconds
+        self.save_global_rng = save_global_rng
+        self.last_step = None
+        self.last_time = None
+
+    def start(self, step):
+        self.last_step = step
+        self.last_time = time.monotonic()
+
+    def due(self, step):
+        if self.every_steps and step - self.last_step >= self.every_steps:
+            return True
+        return bool(self.every_seconds) and time.monotonic() - self.last_time >= self.every_seconds
+
+    def save(self, env):
+        stop = env.trajectory.length
+        if stop <= self.last_step:
+            return
+        regrets, rewards, plays, explorations = env.trajectory.view(self.last_step, stop)
+        segment = {
+            'g': self.g,
+            'start': self.last_step,
+            'stop': stop,
+            'plays': plays,
+            'explorations': explorations,
+            'rewards': rewards,
+            'regrets': regrets,
+            'env_state': env.serialize(with_trajectory=False),
+            'rng_state': np.random.get_state() if self.save_global_rng else None,
+        }
+        os.makedirs(self.directory, exist_ok=True)
+        save_pickle_atomic(os.path.join(self.directory, f"g{self.g}_{stop:012d}.pkl"), segment)
+        self.start(stop)
+
+def segment_progress(folder, r, suffix):
+    # dernier pas sauvegardé par jeu d'un run en cours, d'après les seuls noms de fichiers
+    directory = segment_dir(folder, r, suffix)
+    progress = {}
+    if not os.path.isdir(directory):
+        return progress
+    for fname in os.listdir(directory):
+        match = SEGMENT_PATTERN.match(fname)
+        if match:
+            g, stop = int(match.group(1)), int(match.group(2))
+            progress[g] = max(progress.get(g, 0), stop)
+    return progress
+
+def load_segments(folder, r, suffix):
+    directory = segment_dir(folder, r, suffix)
+    segments = {}
+    if not os.path.isdir(directory):
+        return segments
+    for fname in sorted(os.listdir(directory)):
+        match = SEGMENT_PATTERN.match(fname)
+        if match:
+            with open(os.path.join(directory, fname), "rb") as f:
+                segments.setdefault(int(match.group(1)), []).append(pickle.load(f))
+    return segments
+
+def restore_segments(folder, r, suffix, start_iter, envs):
+    # Rejoue les segments contigus à partir de start_iter sur les environnements du dernier checkpoint complet.
+    # Retourne les environnements restaurés et l'état global du RNG du dernier segment écrit (ou None).
+    segments = load_segments(folder, r, suffix)
+    envs = list(envs)
+    last_rng, last_key = None, None
+    for g, game_segments in segments.items():
+        chain, step = [], start_iter
+        for segment in sorted(game_segments, key=lambda s: s['stop']):
+            if segment['start'] == step:
+                chain.append(segment)
+                step = segment['stop']
+        if not chain:
+            continue
+
+        env = Environnement.from_serialized(chain[-1]['env_state'])
+        if envs[g] is not None:
+            prev_regrets, prev_rewards, prev_plays, prev_explorations = envs[g].trajectory.view(0, start_iter)
+        else:
+            n_agents = len(env.agents)
+            prev_plays = np.zeros((n_agents, 0), dtype=np.int64)
+            prev_explorations = np.zeros((n_agents, 0), dtype=np.int8)
+            prev_rewards = np.zeros((n_agents, 0))
+            prev_regrets = np.zeros((n_agents, 0))
+        env.set_trajectory(Trajectory.from_arrays(
+            np.concatenate([prev_plays] + [s['plays'] for s in chain], axis=1),
+            np.concatenate([prev_explorations] + [s['explorations'] for s in chain], axis=1),
+            np.concatenate([prev_rewards] + [s['rewards'] for s in chain], axis=1),
+            np.concatenate([prev_regrets] + [s['regrets'] for s in chain], axis=1)))
+        envs[g] = env
+
+        # les jeux d'un run s'enchaînent: le dernier segment écrit porte l'état global du RNG le plus récent
+        key = (g, step)
+        if last_key is None or key > last_key:
+            last_key, last_rng = key, chain[-1]['rng_state']
+    return envs, last_rng
+
+def compact_segments(folder, r, suffix):
+    # le checkpoint complet du run contient désormais tous les segments
+    directory = segment_dir(folder, r, suffix)
+    if os.path.isdir(directory):
+        shutil.rmtree(directory)
@@ -0,0 +1,77 @@
+import os
+import json
+from collections import defaultdict
+import numpy as np
+
+from src.runningStats import RunningStats
+from src.utils import load_checkpoint
+
+class StatsStore:
+    # Agrégats persistants d'une expérience (un RunningStats par titre), mis à jour à la fin de chaque run.
+    # contributions[titre][run] = nombre de pas déjà intégrés pour ce run (run = "run{r}{suffix}"),
+    # ce qui rend les mises à jour idempotentes et permet d'étendre l'horizon run par run.
+    file_name = "stats_accumulator.npz"
+
+    def __init__(self, path):
+        self.path = path
+        self.titles = {}
+        self.contributions = defaultdict(dict)
+
+    @staticmethod
+    def load(folder):
+        store = StatsStore(os.path.join(folder, StatsStore.file_name))
+        if not os.path.exists(store.path):
+            return store
+        with np.load(store.path) as data:
+            header = json.loads(str(data['header']))
+            if header['version'] != RunningStats.version:
+                return store
+            for i, meta in enumerate(header['titles']):
+                arrays = {key.split('/', 1)[1]: data[key] for key in data.files if key.startswith(f"t{i}/")}
+                store.titles[meta['title']] = RunningStats.from_arrays(meta['n_agents'], meta['n_actions'], arrays)
+                store.contributions[meta['title']] = meta['contributions']
+        return store
+
+    def save(self):
+        header = {'version': RunningStats.version, 'titles': []}
+        arrays = {}
+        for i, (title, acc) in enumerate(self.titles.items()):
+            header['titles'].append({'title': title, 'n_agents': acc.n_agents, 'n_actions': acc.n_actions,
+                                     'contributions': self.contributions[title]})
+            for name, arr in acc.to_arrays().items():
+                arrays[f"t{i}/{name}"] = arr
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, header=np.array(json.dumps(header)), **arrays)
+        os.replace(tmp_path, self.path)
+
+    def run_keys(self):
+        return {run_key for runs in self.contributions.values() for run_key in runs}
+
+    def covers(self, run_key, horizon):
+        done = [runs[run_key] for runs in self.contributions.values() if run_key in runs]
+        return bool(done) and min(done) >= horizon
+
+    def update(self, title, run_key, n_actions, plays, rewards, regrets, explorations):
+        # trajectoires complètes du run depuis t=0; seuls les pas pas encore intégrés sont ajoutés
+        start = self.contributions[title].get(run_key, 0)
+        if rewards.shape[1] <= start:
+            return
+        if title not in self.titles:
+            self.titles[title] = RunningStats(rewards.shape[0], n_actions)
+        self.titles[title].add_run(plays, rewards, regrets, explorations, start)
+        self.contributions[title][run_key] = rewards.shape[1]
+
+    def update_from_checkpoint(self, pkl_file, run_key):
+        entries_by_title = defaultdict(list)
+        for entry in load_checkpoint(pkl_file)['metrics']:
+            entries_by_title[entry['title']].append(entry)
+        for title, entries in entries_by_title.items():
+            self.update(title, run_key, entries[0]['n_actions'],
+                        *(np.stack([entry[metric] for entry in entries])
+                          for metric in ('play', 'reward', 'regret', 'exploration')))
+
+    def to_stats(self, title):
+        if title not in self.titles:
+            raise ValueError(f"No data found for game: {title}")
+        return self.titles[title].to_stats(title)
@@ -0,0 +1,32 @@
+from src.execute import Execute
+
+# Section optionnelle `sweep` de config.yaml: chaque bloc (name, matrix, noise, algos) est développé en un jeu
+# par (combinaison d'algorithmes, niveau de bruit), dans cet ordre, à la suite des jeux écrits à la main.
+# Un jeu écrit à la main avec plusieurs niveaux de bruit est développé de la même façon.
+
+def expand_entry(entry, algo_combos):
+    for algos in algo_combos:
+        for noise in entry['noise']:
+            yield {**entry, 'noise': [noise], 'algos': list(algos)}
+
+def expand_games(config):
+    expanded = []
+    for game in (config.get('games') or {}).values():
+        expanded += expand_entry(game, [game['algos']])
+    sweep = config.get('sweep') or []
+    for block in sweep if isinstance(sweep, list) else [sweep]:
+        expanded += expand_entry(block, block['algos'])
+
+    # entrées identiques simulées une seule fois; deux jeux différents ne peuvent pas partager un titre
+    games, titles = [], {}
+    for game in expanded:
+        title = Execute.game_title(game['algos'], game['noise'][0], game['name'])
+        if title in titles:
+            if titles[title] != game:
+                raise ValueError(f"Two different games share the title {title}: give them different names.")
+            continue
+        titles[title] = game
+        games.append(game)
+    if len(games) < len(expanded):
+        print(f"ℹ️ Skipped {len(expanded) - len(games)} duplicate game entries.")
+    return {f"game{g + 1}": game for g, game in enumerate(games)}
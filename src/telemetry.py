@@ -0,0 +1,151 @@
+import os
+import json
+import time
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+from src.utils import read_manifest
+from src.segments import segment_progress
+
+def now_iso():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+def completed_steps(folder, runs, suffix, n_games, horizon):
+    # travail déjà fait d'après les manifestes des checkpoints, plus les pas sauvegardés dans les segments d'un
+    # run en cours (l'unité reprise depuis un segment ne compte ensuite que les pas qu'elle simule)
+    done = 0
+    for r in range(runs):
+        manifest = read_manifest(Path(folder) / "pkl" / f"cp_run{r}{suffix}.pkl")
+        start = 0
+        if manifest is not None:
+            start = min(manifest['horizon'], horizon)
+            done += start * min(len(manifest['games']), n_games)
+        for g, stop in segment_progress(folder, r, suffix).items():
+            if g < n_games:
+                done += max(min(stop, horizon) - start, 0)
+    return done
+
+class Telemetry:
+    # Suivi de l'avancement de run_results, écrit dans {folder}/status.json (atomiquement, au plus toutes les
+    # `every` secondes, et à la fin) pour que des outils puissent le lire sans analyser la sortie standard.
+    # Le travail est compté en pas de simulation: runs × jeux × horizon.
+    file_name = "status.json"
+    smoothing = 0.2  # poids d'une nouvelle mesure dans le débit récent (moyenne mobile exponentielle)
+
+    def __init__(self, folder, runs, n_games, horizon, done_steps=0, every=10, suffix=''):
+        self.path = os.path.join(folder, self.file_name)
+        self.runs = runs
+        self.n_games = n_games
+        self.horizon = horizon
+        self.suffix = suffix
+        self.every = every
+        self.total_steps = runs * n_games * horizon
+        self.initial_steps = min(done_steps, self.total_steps)
+        self.session_steps = 0
+        self.started = time.monotonic()
+        self.started_at = now_iso()
+        self.last_write = None
+        self.recent_rate = None
+        self.last_event = self.started
+        self.games = {}
+        self.run_started = {}
+        self.last_run = None
+        self.runs_completed = 0
+        self.checkpoints = {'count': 0, 'last_s': None, 'mean_s': None, 'max_s': None}
+        self.write('running', force=True)
+
+    def unit_done(self, title, runs, steps, seconds):
+        # une unité (jeu d'un run ou d'un lot de runs) terminée; seconds = temps de simulation dans le worker
+        now = time.monotonic()
+        for r in runs:
+            self.run_started.setdefault(r, now - seconds)
+        game = self.games.setdefault(title, {'steps': 0, 'seconds': 0.0})
+        game['steps'] += steps
+        game['seconds'] += seconds
+        game['steps_per_second'] = game['steps'] / game['seconds'] if game['seconds'] else None
+        self.session_steps += steps
+        # débit récent mesuré côté processus principal: inclut le parallélisme des workers
+        elapsed = now - self.last_event
+        if elapsed > 0:
+            rate = steps / elapsed
+            self.recent_rate = rate if self.recent_rate is None else (
+                self.smoothing * rate + (1 - self.smoothing) * self.recent_rate)
+        self.last_event = now
+        self.write('running')
+
+    def run_done(self, r, steps, checkpoint_seconds):
+        now = time.monotonic()
+        seconds = now - self.run_started.pop(r, now)
+        self.runs_completed += 1
+        self.last_run = {'run': r, 'steps': steps, 'seconds': seconds,
+                         'steps_per_second': steps / seconds if seconds else None,
+                         'checkpoint_s': checkpoint_seconds, 'finished_at': now_iso()}
+        cp = self.checkpoints
+        cp['count'] += 1
+        cp['last_s'] = checkpoint_seconds
+        cp['mean_s'] = checkpoint_seconds if cp['mean_s'] is None else (
+            cp['mean_s'] + (checkpoint_seconds - cp['mean_s']) / cp['count'])
+        cp['max_s'] = checkpoint_seconds if cp['max_s'] is None else max(cp['max_s'], checkpoint_seconds)
+        rate = self.last_run['steps_per_second']
+        print(f"⏱️ run={r}: {rate or 0:,.0f} steps/s, checkpoint {checkpoint_seconds:.2f}s, "
+              f"ETA {self.format_eta(self.eta_seconds())}")
+        self.write('running')
+
+    def drop_steps(self, steps):
+        # travail qui ne sera pas fait (jeux arrêtés par le mode adaptatif)
+        self.total_steps -= steps
+        self.initial_steps = min(self.initial_steps, self.total_steps)
+
+    def completed(self):
+        return min(self.initial_steps + self.session_steps, self.total_steps)
+
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.session_steps / elapsed if elapsed > 0 and self.session_steps else None
+
+    def eta_seconds(self):
+        rate = self.recent_rate or self.rate()
+        remaining = self.total_steps - self.completed()
+        if remaining <= 0:
+            return 0.0
+        return remaining / rate if rate else None
+
+    @staticmethod
+    def format_eta(seconds):
+        if seconds is None:
+            return "unknown"
+        return str(timedelta(seconds=int(seconds)))
+
+    def write(self, state, force=False):
+        now = time.monotonic()
+        if not force and self.last_write is not None and now - self.last_write < self.every:
+            return
+        self.last_write = now
+        eta = self.eta_seconds()
+        status = {
+            'state': state,
+            'suffix': self.suffix,
+            'started_at': self.started_at,
+            'updated_at': now_iso(),
+            'elapsed_s': now - self.started,
+            'total_steps': self.total_steps,
+            'completed_steps': self.completed(),
+            'remaining_steps': self.total_steps - self.completed(),
+            'progress': self.completed() / self.total_steps if self.total_steps else 1.0,
+            'steps_per_second': self.rate(),
+            'recent_steps_per_second': self.recent_rate,
+            'eta_s': eta,
+            'eta_at': None if eta is None else (datetime.now(timezone.utc) + timedelta(seconds=eta)).isoformat(
+                timespec='seconds'),
+            'runs': {'total': self.runs, 'completed_this_session': self.runs_completed, 'in_progress': sorted(self.run_started)},
+            'games': self.games,
+            'last_run': self.last_run,
+            'checkpoint': self.checkpoints,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(status, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+    def close(self, state):
+        self.write(state, force=True)
@@ -0,0 +1,55 @@
+import numpy as np
+
+class Trajectory:
+    def __init__(self, n_agents=0, capacity=0):
+        self.length = 0
+        self.plays = np.zeros((n_agents, capacity), dtype=np.int64)
+        self.explorations = np.zeros((n_agents, capacity), dtype=np.int8)
+        self.rewards = np.zeros((n_agents, capacity), dtype=np.float64)
+        self.regrets = np.zeros((n_agents, capacity), dtype=np.float64)
+
+    @property
+    def capacity(self):
+        return self.rewards.shape[1]
+
+    def _resize(self, n_agents, capacity):
+        for name in ('plays', 'explorations', 'rewards', 'regrets'):
+            old = getattr(self, name)
+            new = np.zeros((n_agents, capacity), dtype=old.dtype)
+            new[:old.shape[0], :self.length] = old[:, :self.length]
+            setattr(self, name, new)
+
+    def add_agent(self):
+        self._resize(self.rewards.shape[0] + 1, self.capacity)
+        return self.rewards.shape[0] - 1
+
+    def reserve(self, capacity):
+        if capacity > self.capacity:
+            self._resize(self.rewards.shape[0], capacity)
+
+    def record(self, plays, explorations, rewards, regret):
+        if self.length == self.capacity:
+            # croissance géométrique si l'horizon n'a pas été réservé
+            self.reserve(max(2 * self.capacity, 16))
+        t = self.length
+        self.plays[:, t] = plays
+        self.explorations[:, t] = explorations
+        self.rewards[:, t] = rewards
+        self.regrets[:, t] = regret
+        self.length += 1
+
+    def view(self, start=0, stop=None):
+        # vues sans copie sur les pas [start, stop)
+        stop = self.length if stop is None else min(stop, self.length)
+        return (self.regrets[:, start:stop], self.rewards[:, start:stop],
+                self.plays[:, start:stop], self.explorations[:, start:stop])
+
+    @staticmethod
+    def from_arrays(plays, explorations, rewards, regrets):
+        obj = Trajectory(rewards.shape[0], rewards.shape[1])
+        obj.plays[:] = plays
+        obj.explorations[:] = explorations
+        obj.rewards[:] = rewards
+        obj.regrets[:] = regrets
+        obj.length = rewards.shape[1]
+        return obj
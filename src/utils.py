@@ -2,21 +2,48 @@ import numpy as np
 import pickle
 import os
 import re
-import pandas as pd
+import json
+import hashlib
 from collections import defaultdict
+# pandas est importé dans les fonctions de lecture/écriture des sorties: les commandes qui n'y touchent pas
+# (add_runs, add_horizon) démarrent sans lui
 
-def flatten_metrics(title, player, instance, n_actions, start, metrics_dict):
-    row = {
+# Version 2: une entrée par (jeu, agent), chaque métrique étant un tableau NumPy contigu indexé par le temps.
+# Les checkpoints sans 'schema' sont l'ancien format à une clé par pas de temps (reward_time0, ...).
+CHECKPOINT_SCHEMA = 2
+METRICS = ("play", "reward", "regret", "exploration")
+
+def metrics_entry(title, player, instance, n_actions, metrics_dict):
+    entry = {
         "title": title,
         "player": player,
         "instance": instance,
         "n_actions": n_actions
     }
-
-    for key, val in metrics_dict.items():
-        for t, value in enumerate(val):
-            row[f"{key}{t + start}"] = value
-    return row
+    for metric in METRICS:
+        entry[metric] = np.array(metrics_dict[metric])
+    return entry
+
+def upgrade_checkpoint(cp):
+    if cp.get('schema', 1) >= CHECKPOINT_SCHEMA:
+        return cp
+    pattern = re.compile(r"([a-zA-Z_]+)_time(\d+)$")
+    metrics = []
+    for old in cp['metrics']:
+        by_metric = defaultdict(dict)
+        for key, value in old.items():
+            match = pattern.match(key)
+            if match:
+                by_metric[match.group(1)][int(match.group(2))] = value
+        metrics.append(metrics_entry(
+            old["title"], old["player"], old["instance"], old["n_actions"],
+            {m: [by_metric[m][t] for t in sorted(by_metric[m])] for m in METRICS}
+        ))
+    return {**cp, 'schema': CHECKPOINT_SCHEMA, 'metrics': metrics}
+
+def load_checkpoint(pkl_path):
+    with open(pkl_path, "rb") as f:
+        return upgrade_checkpoint(pickle.load(f))
 
 def sort_metric_columns(df):
     meta_cols = ["title", "player", "instance", "n_actions"]
@@ -61,145 +88,433 @@ def save_pickle_atomic(path, obj):
         pickle.dump(obj, f)
     os.replace(tmp_path, path)
 
-def save_pickle(folder, r, all_games_metrics_for_run, env_list, suffix):
+def save_pickle(folder, r, all_games_metrics_for_run, env_list, suffix, rng_state=None):
+    # rng_state: état global de np.random à la fin du run, s'il a avancé depuis (écriture en arrière-plan)
     env_list_ser = [env.serialize() for env in env_list]
     cp = {
+        'schema': CHECKPOINT_SCHEMA,
         'run_idx': r+1,
         'metrics': all_games_metrics_for_run,
-        'rng_state': np.random.get_state(),
+        'rng_state': np.random.get_state() if rng_state is None else rng_state,
         'env_state': env_list_ser
     }
     pkl_file = f"{folder}/pkl/cp_run{r}{suffix}.pkl"
     os.makedirs(os.path.dirname(pkl_file), exist_ok=True)
+    # la sortie existante (horizon précédent) reste décrite dans le manifeste: la prochaine agrégation n'y ajoute
+    # que les nouveaux pas de temps
+    previous = read_manifest(pkl_file)
     save_pickle_atomic(pkl_file, cp)
+    save_manifest_atomic(pkl_file, build_manifest(cp, pkl_file, suffix, previous['outputs'] if previous else None))
     print(f"📝 Saved checkpoint: run={r}")
+    return cp
+
+# Manifeste JSON à côté de chaque checkpoint: la reprise ne lit que ce petit fichier
+# au lieu de désérialiser tout le pkl ou de relire le csv.
+def manifest_path(pkl_file):
+    return str(pkl_file).removesuffix(".pkl") + ".json"
+
+def build_manifest(cp, pkl_file, suffix, outputs=None):
+    name, keys, pos, has_gauss, cached_gaussian = cp['rng_state']
+    return {
+        'run_idx': cp['run_idx'] - 1,
+        'suffix': suffix,
+        'horizon': get_checkpoint_len(cp)[0],
+        'games': [entry['title'] for entry in cp['metrics'] if entry['player'] == 'agent_0'],
+        'rng_state': [name, np.asarray(keys).tolist(), int(pos), int(has_gauss), float(cached_gaussian)],
+        'pkl_size': os.path.getsize(pkl_file),
+        'outputs': outputs or {},
+    }
 
-def aggregate_metrics_from_single_pkl(file_path):
-    with open(file_path, "rb") as f:
-        cp = pickle.load(f)
-    rows_by_time = defaultdict(lambda: defaultdict(dict))
-
-    pattern = re.compile(r"([a-zA-Z_]+)(\d+)$")
+def save_manifest_atomic(pkl_file, manifest):
+    path = manifest_path(pkl_file)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(manifest, f)
+    os.replace(tmp_path, path)
 
+def read_manifest(pkl_file):
+    # None si absent ou périmé (pkl réécrit sans que le manifeste suive)
+    path = manifest_path(pkl_file)
+    if not os.path.exists(path) or not os.path.exists(pkl_file):
+        return None
+    with open(path, "r") as f:
+        manifest = json.load(f)
+    if manifest['pkl_size'] != os.path.getsize(pkl_file):
+        return None
+    return manifest
+
+TAIL_BYTES = 1 << 16
+
+def file_checksum(path, start=0, end=None):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = os.path.getsize(path) - start if end is None else end - start
+        for block in iter(lambda: f.read(min(1 << 20, remaining)), b""):
+            digest.update(block)
+            remaining -= len(block)
+    return digest.hexdigest()
+
+def tail_checksum(path, size=None):
+    # empreinte des derniers octets seulement: contrôle une sortie avant d'y ajouter des lignes sans la relire
+    size = os.path.getsize(path) if size is None else size
+    return file_checksum(path, max(size - TAIL_BYTES, 0), size)
+
+def output_record(paths, horizon, titles):
+    # fichiers de la sortie d'un run (fichier de base puis parties), horizon et titres qu'ils couvrent
+    return {'files': [{'path': os.path.basename(path), 'size': os.path.getsize(path), 'tail_sha256': tail_checksum(path)}
+                      for path in paths],
+            'horizon': horizon, 'titles': titles}
+
+def output_matches(manifest, kind, path):
+    record = manifest['outputs'].get(kind)
+    if record is None or record.get('horizon', manifest['horizon']) != manifest['horizon']:
+        return False
+    folder = os.path.dirname(path)
+    files = record.get('files', [record])  # anciens manifestes: un seul fichier
+    return (files[0]['path'] == os.path.basename(path)
+            and all(os.path.exists(os.path.join(folder, f['path']))
+                    and os.path.getsize(os.path.join(folder, f['path'])) == f['size'] for f in files))
+
+# Formats de sortie par run. parquet/arrow (pyarrow, optionnel) gardent un groupe de lignes par titre
+# pour que runStats ne lise que les colonnes et le titre demandés.
+OUTPUT_FORMATS = {'csv': '.csv', 'parquet': '.parquet', 'arrow': '.arrow'}
+# Extension d'horizon: le csv reçoit les nouvelles lignes en fin de fichier, parquet/arrow une partie
+# run{r}.part{k}{ext} par extension. Les lecteurs passent le fichier de base et lisent ses parties avec lui.
+PART_PATTERN = re.compile(r"\.part(\d+)$")
+
+def is_output_file(fname):
+    stem, ext = os.path.splitext(fname)
+    return ext in OUTPUT_FORMATS.values() and not PART_PATTERN.search(stem)
+
+def output_parts(path):
+    stem, ext = os.path.splitext(str(path))
+    folder, name = os.path.split(stem)
+    parts = []
+    for fname in os.listdir(folder or "."):
+        part_stem, part_ext = os.path.splitext(fname)
+        match = PART_PATTERN.search(part_stem)
+        if match and part_ext == ext and part_stem[:match.start()] == name:
+            parts.append((int(match.group(1)), os.path.join(folder, fname)))
+    return [str(path)] + [part for _, part in sorted(parts)]
+
+def part_path(path, k):
+    stem, ext = os.path.splitext(str(path))
+    return f"{stem}.part{k}{ext}"
+
+def require_pyarrow(output_format):
+    try:
+        import pyarrow
+        import pyarrow.parquet
+        import pyarrow.ipc
+    except ImportError:
+        raise RuntimeError(f"⚠️ output_format '{output_format}' requires pyarrow (pip install pyarrow).")
+    return pyarrow
+
+def output_format_of(path):
+    for output_format, ext in OUTPUT_FORMATS.items():
+        if str(path).endswith(ext):
+            return output_format
+    raise ValueError(f"Unknown output format: {path}")
+
+def write_output(frames, output_path, output_format):
+    import pandas as pd
+    tmp_path = output_path + ".tmp"
+    if output_format == 'csv':
+        pd.concat(frames, ignore_index=True).to_csv(tmp_path, index=False)
+    elif output_format == 'parquet':
+        pa = require_pyarrow(output_format)
+        schema = pa.Table.from_pandas(frames[0], preserve_index=False).schema
+        with pa.parquet.ParquetWriter(tmp_path, schema) as writer:
+            for frame in frames:
+                writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+    elif output_format == 'arrow':
+        pa = require_pyarrow(output_format)
+        schema = pa.Table.from_pandas(frames[0], preserve_index=False).schema
+        with pa.OSFile(tmp_path, "wb") as sink, pa.ipc.new_file(sink, schema) as writer:
+            for frame in frames:
+                writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+    else:
+        raise ValueError(f"Unknown output format: {output_format}")
+    os.replace(tmp_path, output_path)
+
+def append_output(frames, output_path, output_format, record):
+    # ajoute les lignes des nouveaux pas de temps; renvoie les fichiers de la sortie complétée
+    import pandas as pd
+    paths = [os.path.join(os.path.dirname(output_path), f['path']) for f in record['files']]
+    if output_format == 'csv':
+        with open(output_path, "ab") as f:
+            pd.concat(frames, ignore_index=True).to_csv(f, header=False, index=False)
+        return paths
+    new_part = part_path(output_path, len(paths))
+    write_output(frames, new_part, output_format)
+    return paths + [new_part]
+
+def output_columns(path):
+    import pandas as pd
+    output_format = output_format_of(path)
+    if output_format == 'csv':
+        return list(pd.read_csv(path, nrows=0).columns)
+    pa = require_pyarrow(output_format)
+    if output_format == 'parquet':
+        return pa.parquet.read_schema(path).names
+    with pa.memory_map(str(path)) as source:
+        return pa.ipc.open_file(source).schema.names
+
+def read_output(path, columns=None, title=None):
+    # le fichier de base et ses parties éventuelles (lignes des extensions d'horizon, à trier par time_step)
+    import pandas as pd
+    parts = output_parts(path)
+    if len(parts) == 1:
+        return read_output_file(path, columns, title)
+    return pd.concat([read_output_file(part, columns, title) for part in parts], ignore_index=True)
+
+def read_output_file(path, columns=None, title=None):
+    # projection de colonnes + filtre sur le titre; parquet saute les groupes de lignes des autres titres
+    import pandas as pd
+    output_format = output_format_of(path)
+    if output_format == 'csv':
+        df = pd.read_csv(path, usecols=columns)
+        return df if title is None else df[df['title'] == title]
+    pa = require_pyarrow(output_format)
+    if output_format == 'parquet':
+        filters = None if title is None else [('title', '==', title)]
+        return pa.parquet.read_table(path, columns=columns, filters=filters).to_pandas()
+    with pa.memory_map(str(path)) as source:
+        reader = pa.ipc.open_file(source)
+        batches = []
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            if title is not None and batch.num_rows and batch.column('title')[0].as_py() != title:
+                continue
+            batches.append(batch if columns is None else batch.select(columns))
+        if not batches:
+            names = reader.schema.names if columns is None else columns
+            return pd.DataFrame(columns=names)
+        return pa.Table.from_batches(batches).to_pandas()
+
+def get_output_row_count(path):
+    return sum(get_output_file_row_count(part) for part in output_parts(path))
+
+def get_output_file_row_count(path):
+    output_format = output_format_of(path)
+    if output_format == 'csv':
+        return get_csv_line_count(path)
+    pa = require_pyarrow(output_format)
+    if output_format == 'parquet':
+        return pa.parquet.ParquetFile(path).metadata.num_rows
+    with pa.memory_map(str(path)) as source:
+        reader = pa.ipc.open_file(source)
+        return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+
+def appendable_from(manifest, output_format, output_path, titles, columns, n_steps):
+    # horizon déjà écrit si la sortie existante peut être complétée, sinon None (réécriture complète).
+    # Contrôles bon marché: taille et empreinte de fin de chaque fichier, colonnes; un ajout csv interrompu
+    # (fichier plus long que prévu) est tronqué à la taille enregistrée.
+    record = None if manifest is None else manifest['outputs'].get(output_format)
+    if record is None or 'files' not in record or record['titles'] != titles or not 0 < record['horizon'] < n_steps:
+        return None
+    folder = os.path.dirname(output_path)
+    if record['files'][0]['path'] != os.path.basename(output_path):
+        return None
+    for f in record['files']:
+        path = os.path.join(folder, f['path'])
+        if not os.path.exists(path) or os.path.getsize(path) < f['size'] or tail_checksum(path, f['size']) != f['tail_sha256']:
+            return None
+        if os.path.getsize(path) > f['size']:
+            if output_format != 'csv':
+                return None
+            os.truncate(path, f['size'])
+    if output_columns(output_path) != columns:
+        return None
+    recorded = {f['path'] for f in record['files']}
+    for part in output_parts(output_path)[1:]:
+        # partie écrite sans que le manifeste ait suivi
+        if os.path.basename(part) not in recorded:
+            os.remove(part)
+    return record['horizon']
+
+def aggregate_metrics_from_single_pkl(file_path, output_format='csv', cp=None):
+    # cp: checkpoint déjà en mémoire (juste sauvegardé), pour ne pas relire le pkl
+    import pandas as pd
+    cp = load_checkpoint(file_path) if cp is None else cp
+    entries_by_title = defaultdict(list)
     for entry in cp["metrics"]:
-        title = entry["title"]
-        player = entry["player"]
-        instance = entry["instance"]
-        n_actions = entry["n_actions"]
-
-        for key, value in entry.items():
-            match = pattern.match(key)
-            if match:
-                metric_prefix, t_str = match.groups()
-                t = int(t_str)
-                base_metric = metric_prefix.replace("_time", "").rstrip("_")  # clean up "reward_time" → "reward"
-                colname = f"{base_metric}_{player}"
-                rows_by_time[(title, instance, t)][colname] = value
-
-    tall_rows = []
-    for (title, instance, t), metric_dict in sorted(rows_by_time.items()):
-        row = {"title": title, "n_actions": n_actions, "time_step": t,}
-        row.update(metric_dict)
-        tall_rows.append(row)
-
-    df = pd.DataFrame(tall_rows)
-    df = df.sort_values(["title"])
+        entries_by_title[entry["title"]].append(entry)
+    titles = sorted(entries_by_title)
+    n_steps = len(cp["metrics"][0]["reward"])
 
     fname = os.path.basename(file_path)
     run_id = fname.removesuffix(".pkl").replace("cp_", "")
     output_dir = os.path.join(os.path.dirname(file_path), "..", "output")
     os.makedirs(output_dir, exist_ok=True)
-    output_path = os.path.join(output_dir, f"{run_id}.csv")
-
-    df.to_csv(output_path, index=False)
-    print(f"📄 Saved clean tall-wide CSV: {output_path}")
-
-def recover_last_csv(folder, last_run_id):
+    output_path = os.path.join(output_dir, f"{run_id}{OUTPUT_FORMATS[output_format]}")
+    manifest = read_manifest(file_path)
+    columns = ["title", "n_actions", "time_step"] + [
+        f"{metric}_{entry['player']}" for entry in entries_by_title[titles[0]] for metric in METRICS]
+    start = appendable_from(manifest, output_format, output_path, titles, columns, n_steps)
+
+    frames = []
+    for title in titles:
+        entries = entries_by_title[title]
+        frame = {"title": title, "n_actions": entries[0]["n_actions"], "time_step": np.arange(start or 0, n_steps)}
+        for entry in entries:
+            for metric in METRICS:
+                frame[f"{metric}_{entry['player']}"] = entry[metric][start or 0:]
+        frames.append(pd.DataFrame(frame))
+
+    if start is not None:
+        paths = append_output(frames, output_path, output_format, manifest['outputs'][output_format])
+        action = f"Appended time steps {start}-{n_steps - 1} to {output_format.upper()}:"
+    else:
+        write_output(frames, output_path, output_format)
+        paths = [output_path]
+        # une seule sortie par run, sinon runStats compterait le run deux fois après un changement de format
+        for other_format, ext in OUTPUT_FORMATS.items():
+            other_path = os.path.join(output_dir, f"{run_id}{ext}")
+            if os.path.exists(other_path):
+                for part in output_parts(other_path)[1:]:
+                    os.remove(part)
+                if other_format != output_format:
+                    os.remove(other_path)
+        action = f"Saved clean tall-wide {output_format.upper()}:"
+    suffix = run_id.removeprefix(f"run{cp['run_idx'] - 1}")
+    save_manifest_atomic(file_path, build_manifest(cp, file_path, suffix,
+                                                   {output_format: output_record(paths, n_steps, titles)}))
+    print(f"📄 {action} {output_path}")
+
+def export_csv(output_dir, csv_dir):
+    # export csv à la demande des sorties parquet/arrow
+    os.makedirs(csv_dir, exist_ok=True)
+    for fname in sorted(os.listdir(output_dir)):
+        if is_output_file(fname) and fname.endswith((OUTPUT_FORMATS['parquet'], OUTPUT_FORMATS['arrow'])):
+            csv_path = os.path.join(csv_dir, os.path.splitext(fname)[0] + ".csv")
+            read_output(os.path.join(output_dir, fname)).to_csv(csv_path, index=False)
+            print(f"📄 Exported CSV: {csv_path}")
+
+def recover_last_csv(folder, last_run_id, output_format='csv'):
     pkl_path = os.path.join(folder, f'cp_run{last_run_id}.pkl')
-    aggregate_metrics_from_single_pkl(pkl_path)
+    # interrompu avant que le checkpoint de ce run ne soit écrit: rien à régénérer
+    if os.path.exists(pkl_path):
+        aggregate_metrics_from_single_pkl(pkl_path, output_format)
 
 def get_pickle_len(pkl_path):
-    with open(pkl_path, "rb") as f:
-        checkpoint = pickle.load(f)
+    return get_checkpoint_len(load_checkpoint(pkl_path))
 
-    sample_metrics = checkpoint['metrics'][0]
-    iter_reward = [k for k in sample_metrics.keys() if re.match(r"reward_time\d+$", k)]
-    iter_regret = [k for k in sample_metrics.keys() if re.match(r"regret_time\d+$", k)]
-    iter_play = [k for k in sample_metrics.keys() if re.match(r"play_time\d+$", k)]
-    iter_exp = [k for k in sample_metrics.keys() if re.match(r"exploration_time\d+$", k)]
-    return len(iter_reward), len(iter_regret), len(iter_play), len(iter_exp)
+def get_checkpoint_len(checkpoint):
+    sample_metrics = upgrade_checkpoint(checkpoint)['metrics'][0]
+    return tuple(len(sample_metrics[m]) for m in ("reward", "regret", "play", "exploration"))
 
 def is_csv_complete(csv_file, num_games, expected_iterations):
     if not csv_file.exists():
         return False
-    actual_lines = get_csv_line_count(csv_file)
+    actual_lines = get_output_row_count(csv_file)
     return actual_lines == num_games * expected_iterations
 
 def set_rng_for_run(run_id, seed_base, pkl_path):
     run_pkl = f"{pkl_path}/pkl/cp_run{run_id}.pkl"
-    if os.path.exists(run_pkl):
+    manifest = read_manifest(run_pkl)
+    if manifest is not None:
+        name, keys, pos, has_gauss, cached_gaussian = manifest['rng_state']
+        np.random.set_state((name, np.array(keys, dtype=np.uint32), pos, has_gauss, cached_gaussian))
+    elif os.path.exists(run_pkl):
         with open(run_pkl, "rb") as f:
             cp = pickle.load(f)
         np.random.set_state(cp['rng_state'])
     else:
         np.random.seed(seed_base + run_id)
 
+def action_grids(n_players, k_actions):
+    # une grille ouverte par joueur: grids[i] a la forme (1, .., k, .., 1) et se diffuse sur le tenseur k^n
+    return [np.arange(k_actions).reshape((1,) * i + (k_actions,) + (1,) * (n_players - i - 1))
+            for i in range(n_players)]
+
+def diagonal_mask(n_players, k_actions):
+    # cellules où tous les joueurs jouent la même action, et l'action commune
+    shape = (k_actions,) * n_players
+    mask = np.zeros(shape, dtype=bool)
+    mask.ravel()[np.arange(k_actions) * sum(k_actions ** p for p in range(n_players))] = True
+    return mask, np.broadcast_to(action_grids(n_players, k_actions)[0], shape)
+
 def generate_n_player_PD(n, reward_matrix):
     # 2 pcq trahir vs trahir pas
-    shape = (2,) * n
-    payoffs = [np.zeros(shape) for _ in range(n)]
-
-    for actions in np.ndindex(shape):
-        betray_count = sum(actions)
-
-        for i in range(n):
-            choice_i = actions[i]
-            others = list(actions[:i] + actions[i + 1:])
-            others_betray = sum(others)
-
-            if betray_count == 0:
-                val = reward_matrix[0,0]  # all cooperate
-            elif betray_count == n:
-                val = reward_matrix[1,1]  # all betray
-            elif choice_i == 1 and others_betray == 0:
-                val = reward_matrix[1,0]  # lone betrayer
-            elif choice_i == 0 and others_betray == n - 1:
-                val = reward_matrix[0,1]  # lone cooperator
-            elif choice_i == 1:
-                val = (1+reward_matrix[0,0])/2  # partial betrayal: betrayer reward
-            else:
-                val = (reward_matrix[1,1])/2  # partial betrayal: cooperator punished
-
-            payoffs[i][actions] = val
-
+    grids = action_grids(n, 2)
+    betray_count = sum(grids)
+    payoffs = []
+    for i in range(n):
+        choice_i = grids[i]
+        others_betray = betray_count - choice_i
+        payoffs.append(np.select(
+            [
+                betray_count == 0,                           # all cooperate
+                betray_count == n,                           # all betray
+                (choice_i == 1) & (others_betray == 0),      # lone betrayer
+                (choice_i == 0) & (others_betray == n - 1),  # lone cooperator
+                choice_i == 1,                               # partial betrayal: betrayer reward
+            ],
+            [reward_matrix[0, 0], reward_matrix[1, 1], reward_matrix[1, 0], reward_matrix[0, 1],
+             (1 + reward_matrix[0, 0]) / 2],
+            default=reward_matrix[1, 1] / 2                  # partial betrayal: cooperator punished
+        ))
     return payoffs
 
 def generate_n_player_diag(n_players, k_actions, reward_matrix):
-    shape = (k_actions,) * n_players
-    reward_tensor = np.zeros(shape)
-
-    for action_combo in np.ndindex(shape):
-        if all(a == action_combo[0] for a in action_combo):
-            reward_tensor[action_combo] = reward_matrix[action_combo[0], action_combo[0]]
-        else:
-            reward_tensor[action_combo] = 0.0
-
+    mask, action = diagonal_mask(n_players, k_actions)
+    reward_tensor = np.where(mask, np.diagonal(reward_matrix)[action], 0.0)
     return [reward_tensor] * n_players
 
 def generate_n_player(n_players, k_actions, reward_matrix):
-    shape = (k_actions,) * n_players
-    reward_tensor = np.zeros(shape)
-
-    for action_combo in np.ndindex(shape):
-        if all(a == action_combo[0] for a in action_combo):
-            reward_tensor[action_combo] = reward_matrix[action_combo[0], action_combo[0]]
-        elif any(a == 0 for a in action_combo) and any(a == 2 for a in action_combo):
-            reward_tensor[action_combo] = 0.0
-        else:
-            reward_tensor[action_combo] = 0.2
-
+    mask, action = diagonal_mask(n_players, k_actions)
+    grids = action_grids(n_players, k_actions)
+    has_0 = has_2 = False
+    for grid in grids:
+        has_0 = has_0 | (grid == 0)
+        has_2 = has_2 | (grid == 2)
+    reward_tensor = np.where(mask, np.diagonal(reward_matrix)[action], np.where(has_0 & has_2, 0.0, 0.2))
     return [reward_tensor] * n_players
 
+GAME_GENERATORS = {
+    'diag': lambda n_players, matrix: generate_n_player_diag(n_players, matrix.shape[1], matrix),
+    'general': lambda n_players, matrix: generate_n_player(n_players, matrix.shape[1], matrix),
+    'PD': lambda n_players, matrix: generate_n_player_PD(n_players, matrix),
+}
+_game_cache = {}
+
+def game_key(kind, n_players, reward_matrix):
+    matrix = np.ascontiguousarray(reward_matrix, dtype=float)
+    digest = hashlib.sha1(f"{kind}|{n_players}|{matrix.shape}".encode())
+    digest.update(matrix.tobytes())
+    return digest.hexdigest()
+
+def build_n_player_game(kind, n_players, reward_matrix, cache_dir=None):
+    # Tenseurs normalisés d'un jeu à n joueurs, mis en cache en mémoire (et sur disque si cache_dir)
+    # selon le contenu de la matrice, le nombre de joueurs et le générateur. Les tenseurs renvoyés sont partagés:
+    # ne pas les modifier en place.
+    reward_matrix = np.asarray(reward_matrix, dtype=float)
+    key = game_key(kind, n_players, reward_matrix)
+    if key in _game_cache:
+        return _game_cache[key]
+    path = os.path.join(cache_dir, f"{kind}_{key}.npz") if cache_dir else None
+    if path and os.path.exists(path):
+        with np.load(path) as data:
+            matrices = [data[f"agent_{i}"] for i in range(n_players)]
+    else:
+        normalized = {}
+        matrices = []
+        for tensor in GAME_GENERATORS[kind](n_players, reward_matrix):
+            # les joueurs d'un jeu symétrique partagent le même tenseur: une seule normalisation
+            if id(tensor) not in normalized:
+                normalized[id(tensor)] = normalizeMatrix(tensor, 0)
+            matrices.append(normalized[id(tensor)])
+        if path:
+            os.makedirs(cache_dir, exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **{f"agent_{i}": m for i, m in enumerate(matrices)})
+            os.replace(tmp_path, path)
+    _game_cache[key] = matrices
+    return matrices
+
 def is_diagonal(matrix):
     return np.allclose(matrix, np.diag(np.diagonal(matrix)))
 